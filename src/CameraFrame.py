@@ -38,6 +38,7 @@ import Util
 from RegionFrame import RegionFrame
 from HTM.Region import Region
 from HTM.Synapse import Synapse
+from HTM import Checkpoint
 
 SIGF = "{0:.2f}" #2 significant digits float string format code
 
@@ -155,6 +156,7 @@ class CameraWindow(wx.Panel):
     self._lastFrameTime = clock()
     self._secPerFrame = 1.0 / 15.0
     self._regionShape = (80,60)
+    self._regionInput = numpy.zeros(self._regionShape, dtype=numpy.uint8) #(x,y) input bits
     
     self._prevImage = None
     self._normalImage = None
@@ -396,12 +398,13 @@ class CameraWindow(wx.Panel):
     in their respective UI panels.
     """
     if self._frameOut:
-      imgMat = numpy.array(numpy.asarray(self._frameOut, dtype=numpy.uint8))
+      #write the (y,x) frame directly into the preallocated (x,y) Region input
+      #buffer, 255 for white needs to be 1s instead
+      imgMat = numpy.asarray(self._frameOut, dtype=numpy.uint8)
       imgMat = imgMat.reshape((self._regionShape[1],self._regionShape[0]))
-      imgMat = numpy.swapaxes(imgMat, 0, 1)
-      imgMat /= 255 #255 for white needs to be 1s instead
+      numpy.floor_divide(imgMat.T, 255, self._regionInput)
       
-      rInput = imgMat
+      rInput = self._regionInput
       for i in xrange(len(self.regionPanels)):
         if rInput==None: #stop here if no input for next Region
           break
@@ -860,6 +863,20 @@ class RegionParamsPanel(wx.Panel):
     self.viewButton.Bind(wx.EVT_BUTTON, self.regionViewRun)
     self.viewButton.Disable() #disable until the Region is created
     
+    self.saveButton = wx.Button(self, 0, "Save")
+    self.saveButton.SetToolTipString("Save the trained Region to a checkpoint file.")
+    self.saveButton.Bind(wx.EVT_BUTTON, self.regionSaveRun)
+    self.saveButton.Disable() #disable until the Region is created
+    
+    self.loadButton = wx.Button(self, 0, "Load")
+    self.loadButton.SetToolTipString("Replace the Region with one loaded from a checkpoint file.")
+    self.loadButton.Bind(wx.EVT_BUTTON, self.regionLoadRun)
+    
+    hSizerButtons = wx.BoxSizer(wx.HORIZONTAL)
+    hSizerButtons.Add(self.viewButton, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, border=5)
+    hSizerButtons.Add(self.saveButton, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, border=5)
+    hSizerButtons.Add(self.loadButton, 0, wx.ALIGN_CENTER_VERTICAL)
+    
     hbox = wx.BoxSizer(wx.HORIZONTAL)
     
     panel = wx.Panel(self)
@@ -965,7 +982,7 @@ class RegionParamsPanel(wx.Panel):
     inputBox.Add(self.onButton, 0, wx.ALIGN_CENTER_HORIZONTAL | wx.BOTTOM, border=5)
     inputBox.Add(hSizerLearn, 0, wx.ALIGN_CENTER_HORIZONTAL | wx.TOP, border=5)
     inputBox.Add(panel, 0)#, wx.ALL, border=5)
-    inputBox.Add(self.viewButton, 0, wx.ALIGN_CENTER_HORIZONTAL)
+    inputBox.Add(hSizerButtons, 0, wx.ALIGN_CENTER_HORIZONTAL)
     
     vSizer = wx.BoxSizer(wx.VERTICAL)
     vSizer.Add(inputBox, 0, wx.ALIGN_LEFT | wx.ALL, border=0)
@@ -1064,6 +1081,8 @@ class RegionParamsPanel(wx.Panel):
     self.colXSpin.Enable(not isOn)
     self.colYSpin.Enable(not isOn)
     self.viewButton.Enable(self.region!=None)
+    self.saveButton.Enable(self.region!=None)
+    self.loadButton.Enable(not isOn)
     
   def regionViewRun(self, evt=None):
     """ User clicked button to launch Region Visualization view. """
@@ -1072,6 +1091,60 @@ class RegionParamsPanel(wx.Panel):
       self.regionFrame.SetTitle("Visualizer for Region "+str(self.regionID))
       self.regionFrame.Show()
   
+  def regionSaveRun(self, evt=None):
+    """ User clicked button to save the Region to a checkpoint file. """
+    dialog = wx.FileDialog(self, "Save Region "+str(self.regionID), \
+                           wildcard="Region checkpoints (*.htm)|*.htm", \
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
+    if dialog.ShowModal()==wx.ID_OK:
+      Checkpoint.saveRegion(self.region, dialog.GetPath())
+    dialog.Destroy()
+  
+  def regionLoadRun(self, evt=None):
+    """ 
+    User clicked button to load the Region from a checkpoint file.  The UI 
+    parameters are updated to match the loaded Region so it is kept (rather
+    than rebuilt) when the Region is turned on.
+    """
+    dialog = wx.FileDialog(self, "Load Region "+str(self.regionID), \
+                           wildcard="Region checkpoints (*.htm)|*.htm", \
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST)
+    path = None
+    if dialog.ShowModal()==wx.ID_OK:
+      path = dialog.GetPath()
+    dialog.Destroy()
+    if not path:
+      return
+    
+    region = Checkpoint.loadRegion(path)
+    if (region.inputWidth, region.inputHeight)!=tuple(self.inputSize):
+      error = "The Region in "+path+" expects input of size "+ \
+              str(region.inputWidth)+"x"+str(region.inputHeight)+ \
+              " rather than the "+str(self.inputSize[0])+"x"+ \
+              str(self.inputSize[1])+" input of this Region."
+      msg = wx.MessageDialog(self, error, "Load Region Error", wx.OK | wx.ICON_ERROR)
+      msg.ShowModal()
+      return
+    
+    self.inputPerColSpin.SetValue(int(round(region.pctInputPerCol*100)))
+    self.minOverlapSpin.SetValue(int(round(region.pctMinOverlap*100)))
+    self.localityRadSpin.SetValue(region.localityRadius)
+    self.desireLocalSpin.SetValue(int(round(region.pctLocalActivity*100)))
+    self.cellsPerColSpin.SetValue(region.cellsPerCol)
+    self.thresholdSpin.SetValue(region.segActiveThreshold)
+    self.newSynSpin.SetValue(region.newSynapseCount)
+    self.colXSpin.SetValue(region.width)
+    self.colYSpin.SetValue(region.height)
+    
+    if self.regionFrame:
+      self.regionFrame.Close()
+      self.regionFrame = None
+    self.region = region
+    self.resetRunningAverages()
+    self.inhiRadValText.SetLabel(SIGF.format(self.region.inhibitionRadius))
+    self.viewButton.Enable()
+    self.saveButton.Enable()
+  
   def __checkCreateRegion(self):
     """ 
     Create the Region using the currently set UI parameters. The region
@@ -1124,8 +1197,10 @@ class RegionParamsPanel(wx.Panel):
     using the last processed video frame (or last processed output from the
     previous Region in the hierarchy).  Set the Region to learn based on
     checkbox enablement in the UI.
-    @param inputData: current bit-matrix input to this Region.
-    @return the output bit-matrix of the Region (or None if Region disabled).
+    @param inputData: current bit-matrix input to this Region (or the flat
+    indices of its set bits, as output by the previous Region).
+    @return the indices of the set bits of the Region's output bit-matrix
+    (or None if Region disabled).
     """
     if not self.onButton.GetValue(): #Region disabled, return None
       return None
@@ -1194,7 +1269,8 @@ class RegionParamsPanel(wx.Panel):
               self.predictedCols[col.cx][col.cy] = 1
               break
     
-    return self.region.getOutput()
+    #hand only the set output bits to the next Region in the hierarchy
+    return self.region.getSparseOutput()
 
 
 class ImageCanvas(wx.ScrolledWindow):
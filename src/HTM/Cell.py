@@ -4,7 +4,7 @@ Created on Jan 20, 2011
 @author: Barry Maturkanich
 '''
 
-import random
+import numpy
 from HTM.Segment import Segment
 
 MIN_SYNAPSES_PER_SEGMENT_THRESHOLD = 1
@@ -14,6 +14,8 @@ class Cell(object):
   Represents an HTM sequence cell that belongs to a given Column.
   """
   
+  __slots__ = ('column', 'index', 'region', 'statePos', 'segments')
+  
   def __init__(self, column, index):
     """ 
     Create a new Cell belonging to the specified Column. The index is an 
@@ -21,35 +23,63 @@ class Cell(object):
     """
     self.column = column
     self.index = index
+    #the cell states (at t and t-1) are stored in the Region's cell state
+    #arrays at position (column.index, index), see the properties below.
+    self.region = column.region
+    self.statePos = (column.index, index)
     self.isActive = False
-    self.__wasActive = False
     self.isPredicting = False
-    self.__wasPredicted = False
     self.isLearning = False
-    self.__wasLearning = False
     self.segments = []
   
+  @property
+  def isActive(self):
+    return bool(self.region.cellActive[self.statePos])
+  
+  @isActive.setter
+  def isActive(self, isActive):
+    self.region.cellActive[self.statePos] = isActive
+  
+  @property
+  def isPredicting(self):
+    return bool(self.region.cellPredicting[self.statePos])
+  
+  @isPredicting.setter
+  def isPredicting(self, isPredicting):
+    self.region.cellPredicting[self.statePos] = isPredicting
+  
+  @property
+  def isLearning(self):
+    return bool(self.region.cellLearning[self.statePos])
+  
+  @isLearning.setter
+  def isLearning(self, isLearning):
+    self.region.cellLearning[self.statePos] = isLearning
+  
   @property
   def wasActive(self):
-    return self.__wasActive
+    return bool(self.region.cellWasActive[self.statePos])
   
   @property
   def wasLearning(self):
-    return self.__wasLearning
+    return bool(self.region.cellWasLearning[self.statePos])
   
   @property
   def wasPredicted(self):
-    return self.__wasPredicted
+    return bool(self.region.cellWasPredicted[self.statePos])
   
   def nextTimeStep(self):
     """ 
     Advance this cell to the next time step. The current state of this cell
     (active, learning, predicting) will be set as the previous state and the current
     state will be reset to no cell activity by default until it can be determined. 
+    The Region normally advances all of its cells at once (see Region.runOnce).
     """
-    self.__wasPredicted = self.isPredicting
-    self.__wasActive = self.isActive
-    self.__wasLearning = self.isLearning
+    region = self.region
+    i = self.statePos
+    region.cellWasPredicted[i] = region.cellPredicting[i]
+    region.cellWasActive[i] = region.cellActive[i]
+    region.cellWasLearning[i] = region.cellLearning[i]
     self.isPredicting = False
     self.isActive = False
     self.isLearning = False
@@ -60,12 +90,36 @@ class Cell(object):
     at most newSynapseCount synapses randomly selected from the set of cells that
     were in the learning state at t-1 (specified by the learningCells parameter).
     @param learningCells: the set of available learning cells to add to the segment.
+    If the Region limits the number of segments per cell and this Cell is at the
+    limit, the least recently active segment is removed first.
     @return the segment that was just created.
     """
-    newSegment = Segment(self.column.region.segActiveThreshold)
+    maxSegments = self.region.maxSegmentsPerCell
+    if maxSegments > 0 and len(self.segments) >= maxSegments:
+      leastRecent = min(self.segments, key=lambda seg: seg.lastActiveStep)
+      self.removeSegment(leastRecent)
+    
+    if self.region.distalPool:
+      newSegment = self.region.distalPool.createSegment(self)
+    else:
+      newSegment = Segment(self.region.segActiveThreshold, self.region.segmentActivity, self)
+    newSegment.lastActiveStep = self.region.timeStep
     newSegment.createSynapsesToLearningCells(learningCells)
     self.segments.append(newSegment)
     return newSegment
+  
+  def removeSegment(self, segment):
+    """
+    Remove the specified segment (and all of its synapses) from this Cell.  The 
+    removal is counted in the Region's pruning counters.
+    @param segment: the segment of this Cell to remove.
+    """
+    region = self.region
+    self.segments.remove(segment)
+    region.prunedSegments += 1
+    region.prunedSynapses += len(segment.synapses)
+    segment.removeSynapses(list(segment.synapses))
+    region.segmentActivity.removeSegment(segment)
     
   def getPreviousActiveSegment(self):
     """
@@ -87,9 +141,9 @@ class Cell(object):
       
       #if multiple possible segments, return segment with most activity
       bestSegment = activeSegs[0]
-      mostActiveSyns = len(activeSegs[0].getPrevActiveSynapses())
+      mostActiveSyns = activeSegs[0].getPrevActiveCount()
       for seg in activeSegs[1:]:
-        activeSyns = len(seg.getPrevActiveSynapses())
+        activeSyns = seg.getPrevActiveCount()
         if activeSyns > mostActiveSyns:
           mostActiveSyns = activeSyns
           bestSegment = seg
@@ -141,9 +195,9 @@ class Cell(object):
     segments = [seg for seg in self.segments if seg.isSequence==isSequence]
     for seg in segments:
       if previous:
-        synCount = len(seg.getPrevActiveSynapses(connectedOnly=False))
+        synCount = seg.getPrevActiveCount(connectedOnly=False)
       else:
-        synCount = len(seg.getActiveSynapses(connectedOnly=False))
+        synCount = seg.getActiveCount(connectedOnly=False)
       if synCount > bestSynapseCount:
         bestSynapseCount = synCount
         bestSegment = seg
@@ -162,9 +216,14 @@ class SegmentUpdateInfo(object):
   The structure also determines which learning cells (at this time step)
   are available to connect (add synapses to) should the segment get updated.
   If there is a locality radius set on the Region, the pool of learning cells
-  is restricted to those with the radius.
+  is restricted to those with the radius.  The candidate learning cells are
+  looked up from the Region's per time step learning cell index and sampled
+  with the Region's numpy random generator.
   """
   
+  __slots__ = ('cell', 'segment', 'activeSynapses', 'addNewSynapses', 'isSequence',
+               'addedSynapses', 'timeStep', 'learningCells')
+  
   def __init__(self, cell, segment, activeSynapses, addNewSynapses=False):
     self.cell = cell
     self.segment = segment
@@ -173,36 +232,19 @@ class SegmentUpdateInfo(object):
     self.isSequence = False
     self.addedSynapses = [] #once synapses added, store here to visualize later
     
-    learningCells = set({}) #capture learning cells at this time step
-    
-    #do not add >1 synapse to the same cell on a given segment
+    #capture learning cells at this time step (flat cell indices), only 
+    #allowing cells of Columns within locality radius (if any)
     region = self.cell.column.region
+    self.timeStep = region.timeStep #Region time step the update was created
+    learningCells = []
     if addNewSynapses:
-      segCells = set({})
-      if self.segment:
-        for syn in self.segment.synapses:
-          segCells.add(syn.inputSource)
-      #only allow connecting to Columns within locality radius
-      cellCol = cell.column
-      
-      #if localityRadius is 0, it means 'no restriction'
-      if region.localityRadius > 0:
-        minY = max(0, cellCol.cy-region.localityRadius)
-        maxY = min(region.height-1, cellCol.cy+region.localityRadius)
-        minX = max(0, cellCol.cx-region.localityRadius)
-        maxX = min(region.width-1, cellCol.cx+region.localityRadius)
-      else:
-        minY = 0
-        maxY = region.height-1
-        minX = 0
-        maxX = region.width-1
-        
-      for y in xrange(minY,maxY+1):
-        for x in xrange(minX,maxX+1):
-          col = region.columnGrid[x][y]
-          for cell in col.cells:
-            if cell.wasLearning and cell not in segCells:
-              learningCells.add(cell)
+      learningCells = region.getLearningCells(cell.column)
+      #do not add >1 synapse to the same cell on a given segment
+      if self.segment and len(learningCells) > 0:
+        cpc = region.cellsPerCol
+        segCells = [syn.inputSource.statePos for syn in self.segment.synapses]
+        segCells = [ci*cpc + i for ci, i in segCells]
+        learningCells = learningCells[~numpy.in1d(learningCells, segCells)]
     
     synCount = region.newSynapseCount
     if self.segment:
@@ -211,5 +253,6 @@ class SegmentUpdateInfo(object):
     
     self.learningCells = []
     if len(learningCells) > 0 and synCount > 0:
-      self.learningCells = random.sample(learningCells, synCount)
+      sample = region.rng.choice(learningCells, synCount, replace=False)
+      self.learningCells = [region.cells[i] for i in sample]
 
@@ -0,0 +1,262 @@
+"""
+Created on Oct 16, 2026
+
+Save and load trained HTM Regions as compact binary checkpoint files.
+
+A checkpoint is a single versioned file holding the Region's parameters and
+scalar state in a small JSON header, followed by every piece of the Region's
+learned state as flat numpy arrays: the proximal synapse inputs and
+permanences, the distal segments and their synapse sources and permanences
+(in compressed sparse row form), the duty cycles and boosts, the cell states
+and the learning random generator.  The file also holds the arrays of the
+Region compiled for inference (see FrozenRegion).
+
+File layout (all integers little endian):
+  8 bytes   MAGIC
+  uint32    format VERSION
+  uint32    length of the JSON header in bytes
+  ...       JSON header: Region parameters, scalar state and the dtype,
+            shape and offset of every array
+  ...       array data, each array starting on an ALIGNMENT byte boundary
+            (offsets are relative to the first boundary after the header)
+
+Loading memory-maps the file.  loadFrozenRegion uses the mapped arrays in
+place, so even a large trained Region is ready to infer in milliseconds and
+several worker processes loading the same file share one read-only copy of
+it.  loadRegion instead copies the arrays into a new, trainable Region.
+Segment updates still queued when the Region was saved are not kept.
+"""
+
+import json
+import struct
+import numpy
+from HTM.Region import Region
+from HTM.Synapse import Synapse
+from HTM.Segment import Segment
+from HTM.FrozenRegion import FrozenRegion
+
+MAGIC = 'HTMREGN\0'
+VERSION = 1
+ALIGNMENT = 64 #byte alignment of every array within the file
+FROZEN_PREFIX = 'frozen.' #name prefix of the FrozenRegion arrays
+
+#Region constructor parameters, saved so the Region can be rebuilt
+PARAM_NAMES = ('pctInputPerCol', 'pctMinOverlap', 'localityRadius',
+               'pctLocalActivity', 'cellsPerCol', 'segActiveThreshold',
+               'newSynapseCount', 'useArrays', 'maxSegmentsPerCell',
+               'maxSynapsesPerSegment', 'maxUpdateAge', 'maxUpdatesPerCell')
+#scalar Region state restored after construction
+STATE_NAMES = ('inhibitionRadius', 'desiredLocalActivity', 'minOverlap',
+               'timeStep', 'prunedSegments', 'prunedSynapses',
+               'expiredUpdates', 'spatialLearning', 'temporalLearning')
+#Region arrays restored as they are
+GRID_NAMES = ('inputData', 'overlapGrid', 'activeGrid', 'boostGrid',
+              'activeDutyGrid', 'overlapDutyGrid', 'cellActive',
+              'cellPredicting', 'cellLearning', 'cellWasActive',
+              'cellWasPredicted', 'cellWasLearning')
+
+def _toJSON(value):
+  """ Convert numpy scalars and tuples to plain types JSON can encode. """
+  if isinstance(value, (tuple, list)):
+    return [_toJSON(v) for v in value]
+  if isinstance(value, (bool, numpy.bool_)):
+    return bool(value)
+  if isinstance(value, (int, long, numpy.integer)):
+    return int(value)
+  if isinstance(value, (float, numpy.floating)):
+    return float(value)
+  return value
+
+def _align(offset):
+  """ Round the offset up to the next ALIGNMENT byte boundary. """
+  return (offset + ALIGNMENT-1) // ALIGNMENT * ALIGNMENT
+
+def getRegionArrays(region):
+  """
+  Return a dict of all the arrays that describe the learned state of the
+  region (excluding its compiled FrozenRegion arrays).
+  @param region: the Region to gather the arrays of.
+  """
+  arrays = dict((name, getattr(region, name)) for name in GRID_NAMES)
+
+  if region.proximalPool:
+    arrays['proximalInput'] = region.proximalPool.inputIndex
+    arrays['proximalPermanence'] = region.proximalPool.permanence
+  else:
+    inputs = []
+    perms = []
+    for col in region.columns:
+      for syn in col.proximalSegment.synapses:
+        inputs.append(syn.inputSource.ix*region.inputHeight + syn.inputSource.iy)
+        perms.append(syn.permanence)
+    shape = (len(region.columns), -1)
+    arrays['proximalInput'] = numpy.array(inputs, dtype=numpy.int32).reshape(shape)
+    arrays['proximalPermanence'] = numpy.array(perms).reshape(shape)
+
+  #distal segments of all cells (in cell order) as compressed sparse rows,
+  #the synapses of segment s are segmentStart[s]:segmentStart[s+1]
+  cpc = region.cellsPerCol
+  segmentCell = []
+  segmentSequence = []
+  segmentLastActive = []
+  segmentStart = [0]
+  presynaptic = []
+  permanence = []
+  for cell in region.cells:
+    for seg in cell.segments:
+      segmentCell.append(cell.column.index*cpc + cell.index)
+      segmentSequence.append(seg.isSequence)
+      segmentLastActive.append(seg.lastActiveStep)
+      for syn in seg.synapses:
+        source = syn.inputSource
+        presynaptic.append(source.column.index*cpc + source.index)
+        permanence.append(syn.permanence)
+      segmentStart.append(len(presynaptic))
+  arrays['segmentCell'] = numpy.array(segmentCell, dtype=numpy.int32)
+  arrays['segmentSequence'] = numpy.array(segmentSequence, dtype=numpy.bool_)
+  arrays['segmentLastActive'] = numpy.array(segmentLastActive, dtype=numpy.int64)
+  arrays['segmentStart'] = numpy.array(segmentStart, dtype=numpy.int64)
+  arrays['synapsePresynaptic'] = numpy.array(presynaptic, dtype=numpy.int32)
+  arrays['synapsePermanence'] = numpy.array(permanence)
+
+  arrays['rngKeys'] = region.rng.get_state()[1]
+  return arrays
+
+def saveRegion(region, path):
+  """
+  Save the learned state of the region to a checkpoint file at the path.
+  @param region: the Region to save.
+  @param path: file path of the checkpoint to (over)write.
+  """
+  arrays = getRegionArrays(region)
+  frozenState, frozenArrays = region.freeze().getState()
+  for name, array in frozenArrays.iteritems():
+    arrays[FROZEN_PREFIX+name] = array
+
+  rngState = region.rng.get_state()
+  params = dict((name, getattr(region, name)) for name in PARAM_NAMES)
+  params['inputSize'] = (region.inputWidth, region.inputHeight)
+  params['colGridSize'] = (region.width, region.height)
+  state = dict((name, getattr(region, name)) for name in STATE_NAMES)
+  state['connectedPerm'] = Synapse.CONNECTED_PERM
+  state['rngPos'] = rngState[2]
+  state['rngHasGauss'] = rngState[3]
+  state['rngCachedGaussian'] = rngState[4]
+  if region.proximalPool:
+    state['overlapMode'] = region.proximalPool.overlapMode
+
+  layout = {}
+  offset = 0
+  for name in sorted(arrays):
+    array = numpy.ascontiguousarray(arrays[name])
+    arrays[name] = array
+    layout[name] = {'dtype': array.dtype.str, 'shape': array.shape, 'offset': offset}
+    offset = _align(offset + array.nbytes)
+
+  header = json.dumps(_toJSON({'params': params, 'state': state,
+                                'frozen': frozenState, 'arrays': layout}))
+  prefix = MAGIC + struct.pack('<II', VERSION, len(header)) + header
+  dataStart = _align(len(prefix))
+
+  f = open(path, 'wb')
+  try:
+    f.write(prefix)
+    for name in sorted(arrays):
+      f.seek(dataStart + layout[name]['offset'])
+      arrays[name].tofile(f)
+    f.truncate(dataStart + offset)
+  finally:
+    f.close()
+
+def readCheckpoint(path):
+  """
+  Memory-map the checkpoint file at the path.
+  @return a tuple of the JSON header dict and a dict of all the (read-only,
+  memory-mapped) arrays by name.
+  """
+  f = open(path, 'rb')
+  try:
+    prefix = f.read(len(MAGIC) + 8)
+    if prefix[:len(MAGIC)]!=MAGIC:
+      raise ValueError("%s is not a Region checkpoint" % path)
+    version, headerLength = struct.unpack('<II', prefix[len(MAGIC):])
+    if version > VERSION:
+      raise ValueError("unsupported Region checkpoint version %d" % version)
+    header = json.loads(f.read(headerLength))
+  finally:
+    f.close()
+
+  data = numpy.memmap(path, dtype=numpy.uint8, mode='r')
+  dataStart = _align(len(prefix) + headerLength)
+  arrays = {}
+  for name, info in header['arrays'].iteritems():
+    dtype = numpy.dtype(str(info['dtype']))
+    shape = tuple(info['shape'])
+    start = dataStart + info['offset']
+    nbytes = dtype.itemsize * int(numpy.prod(shape))
+    arrays[name] = data[start:start+nbytes].view(dtype).reshape(shape)
+  return header, arrays
+
+def loadFrozenRegion(path):
+  """
+  Load the inference-only FrozenRegion saved in the checkpoint file at the
+  path.  Its compiled connectivity arrays remain memory-mapped read-only.
+  @return the loaded FrozenRegion.
+  """
+  header, arrays = readCheckpoint(path)
+  n = len(FROZEN_PREFIX)
+  frozenArrays = dict((name[n:], array) for name, array in arrays.iteritems() \
+                      if name.startswith(FROZEN_PREFIX))
+  return FrozenRegion.fromState(header['frozen'], frozenArrays)
+
+def loadRegion(path):
+  """
+  Load a new trainable Region from the checkpoint file at the path.  The
+  saved state is copied into the Region, so the file may be removed after.
+  Synapse.CONNECTED_PERM (shared by all Regions) is set to the value it had
+  when the Region was saved.
+  @return the loaded Region.
+  """
+  header, arrays = readCheckpoint(path)
+  params = dict((str(name), value) for name, value in header['params'].iteritems())
+  state = header['state']
+  Synapse.setConnectedPerm(state['connectedPerm'])
+  #the proximal synapses are replaced below so skip the default construction
+  region = Region(fastInit=True, **params)
+
+  proximalInput = numpy.array(arrays['proximalInput'])
+  proximalPermanence = numpy.array(arrays['proximalPermanence'])
+  if region.proximalPool:
+    region.proximalPool.setSynapses(proximalInput, proximalPermanence)
+    region.proximalPool.overlapMode = str(state['overlapMode'])
+  else:
+    h = region.inputHeight
+    for col, inputs, perms in zip(region.columns, proximalInput.tolist(), \
+                                  proximalPermanence.tolist()):
+      col.proximalSegment = Segment(region.segActiveThreshold)
+      for i, perm in zip(inputs, perms):
+        col.proximalSegment.addSynapse(Synapse(region.getInputCell(i // h, i % h), perm))
+  region.receptiveFieldPerm = None #rescan the connected synapses when next needed
+
+  cells = region.cells
+  segmentStart = arrays['segmentStart'].tolist()
+  presynaptic = arrays['synapsePresynaptic'].tolist()
+  permanence = arrays['synapsePermanence'].tolist()
+  segmentLastActive = arrays['segmentLastActive'].tolist()
+  for s, (c, isSequence) in enumerate(zip(arrays['segmentCell'].tolist(), \
+                                          arrays['segmentSequence'].tolist())):
+    segment = cells[c].createSegment([])
+    segment.isSequence = isSequence
+    segment.lastActiveStep = segmentLastActive[s]
+    for i in xrange(segmentStart[s], segmentStart[s+1]):
+      segment.addSynapse(Synapse(cells[presynaptic[i]], permanence[i]))
+
+  for name in GRID_NAMES:
+    getattr(region, name)[...] = arrays[name]
+  for name in STATE_NAMES:
+    setattr(region, name, state[name])
+  region.rng.set_state(('MT19937', numpy.array(arrays['rngKeys']), state['rngPos'], \
+                        state['rngHasGauss'], state['rngCachedGaussian']))
+  region.segmentActivity.invalidate()
+  region.learningCellIndex.clear()
+  return region
@@ -15,6 +15,8 @@ class Column(object):
   Represents a single column of cells within an HTM Region. 
   """
   
+  __slots__ = ('region', 'cx', 'cy', 'index', 'cells', 'proximalSegment', 'ix', 'iy')
+  
   def __init__(self, region, srcPos, pos):
     """ 
     Construct a new Column for the given parent region at source row/column
@@ -26,25 +28,76 @@ class Column(object):
                Region's column grid.
     """
     self.region = region  #parent region
+    self.cx = pos[0] #'column grid' row and col
+    self.cy = pos[1]
+    self.index = self.cx*region.height + self.cy #position in region.columns
     self.cells = [Cell(self, i) for i in xrange(region.cellsPerCol)] #Sequence cells
     self.isActive = False #whether or not this Column is currently active.
     #The list of potential synapses and their permanence values.
     self.proximalSegment = Segment(region.segActiveThreshold)
-    #The boost value for column c as computed during learning. 
-    #  used to increase the overlap value for inactive columns.
+    #The boost, duty cycles and overlap values are stored in the Region's
+    #column grid arrays (see the properties below).
     self.boost = 1.0
-    #A sliding average representing how often column c has been active 
-    #  after inhibition (e.g. over the last 1000 iterations).
     self.activeDutyCycle = 1.0
-    #A sliding average representing how often column c has had 
-    #  significant overlap (i.e. greater than minOverlap) with its inputs 
-    #  (e.g. over the last 1000 iterations).
     self.overlapDutyCycle = 1.0
     self.overlap = 0 #the last computed input overlap for the Column.
     self.ix = srcPos[0] #'input' row and col
     self.iy = srcPos[1]
-    self.cx = pos[0] #'column grid' row and col
-    self.cy = pos[1]
+  
+  @property
+  def overlap(self):
+    """ The last computed input overlap for the Column. """
+    return self.region.overlapGrid[self.cx, self.cy]
+  
+  @overlap.setter
+  def overlap(self, overlap):
+    self.region.overlapGrid[self.cx, self.cy] = overlap
+  
+  @property
+  def boost(self):
+    """ 
+    The boost value for column c as computed during learning. 
+    Used to increase the overlap value for inactive columns.
+    """
+    return self.region.boostGrid[self.cx, self.cy]
+  
+  @boost.setter
+  def boost(self, boost):
+    self.region.boostGrid[self.cx, self.cy] = boost
+  
+  @property
+  def activeDutyCycle(self):
+    """ 
+    A sliding average representing how often column c has been active 
+    after inhibition (e.g. over the last 1000 iterations).
+    """
+    return self.region.activeDutyGrid[self.cx, self.cy]
+  
+  @activeDutyCycle.setter
+  def activeDutyCycle(self, dutyCycle):
+    self.region.activeDutyGrid[self.cx, self.cy] = dutyCycle
+  
+  @property
+  def overlapDutyCycle(self):
+    """ 
+    A sliding average representing how often column c has had 
+    significant overlap (i.e. greater than minOverlap) with its inputs 
+    (e.g. over the last 1000 iterations).
+    """
+    return self.region.overlapDutyGrid[self.cx, self.cy]
+  
+  @overlapDutyCycle.setter
+  def overlapDutyCycle(self, dutyCycle):
+    self.region.overlapDutyGrid[self.cx, self.cy] = dutyCycle
+  
+  @property
+  def isActive(self):
+    """ Whether or not this Column is currently active. """
+    return bool(self.region.activeGrid[self.cx, self.cy])
+  
+  @isActive.setter
+  def isActive(self, isActive):
+    self.region.activeGrid[self.cx, self.cy] = isActive
   
   def setActive(self, isActive):
     """
@@ -62,6 +115,12 @@ class Column(object):
     this Column. """
     return self.proximalSegment.getConnectedSynapses()
   
+  def getSynapseDistance(self, syn):
+    """ Return the distance (in column grid space) from this Column's center
+    to the input bit of the given proximal synapse. """
+    d = ((self.ix-syn.inputSource.ix)**2 + (self.iy-syn.inputSource.iy)**2)**0.5
+    return d / self.region.xSpace
+  
   def getBestMatchingCell(self, isSequence, previous=False):
     """
     For this column, return the cell with the best matching segment (at time t-1 if
@@ -77,9 +136,9 @@ class Column(object):
       seg = cell.getBestMatchingSegment(isSequence, previous)
       if seg:
         if previous:
-          synCount = len(seg.getPrevActiveSynapses(connectedOnly=False))
+          synCount = seg.getPrevActiveCount(connectedOnly=False)
         else:
-          synCount = len(seg.getActiveSynapses(connectedOnly=False))
+          synCount = seg.getActiveCount(connectedOnly=False)
         if synCount > bestCount:
           bestCell = cell
           bestSeg = seg
@@ -118,10 +177,12 @@ class Column(object):
     otherwise it is decremented. Permanence values are constrained to be between 0 and 1.
     """
     for syn in self.proximalSegment.synapses:
+      wasConnected = syn.isConnected
       if syn.isActive():
         syn.increasePermanence()
       else:
         syn.decreasePermanence()
+      self.__checkConnectionChange(syn, wasConnected)
   
   def performBoosting(self):
     """
@@ -156,7 +217,18 @@ class Column(object):
     Increase the permanence value of every synapse in this column by a scale factor.
     """
     for syn in self.proximalSegment.synapses:
+      wasConnected = syn.isConnected
       syn.increasePermanence(scale)
+      self.__checkConnectionChange(syn, wasConnected)
+  
+  def __checkConnectionChange(self, syn, wasConnected):
+    """ Notify the Region if the proximal synapse just crossed the connected 
+    permanence threshold so it can update its receptive field size. """
+    if syn.isConnected != wasConnected:
+      if syn.isConnected:
+        self.region.updateReceptiveField(self.getSynapseDistance(syn), 1)
+      else:
+        self.region.updateReceptiveField(-self.getSynapseDistance(syn), -1)
   
   def updateActiveDuteCycle(self):
     """ 
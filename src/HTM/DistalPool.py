@@ -0,0 +1,370 @@
+"""
+Created on Oct 16, 2026
+
+Array-backed storage for the distal (temporal pooling) segments and synapses
+of every Cell in a Region.
+
+All distal synapses of the Region are kept in a single pool of parallel numpy
+arrays holding each synapse's presynaptic cell, permanence and owning segment.
+Given the Region's cell state arrays, the number of active synapses of every
+segment (at time t or t-1) can then be found with a single gather followed by
+a bincount over the owning segment ids, rather than by each Segment building
+its own filtered list of synapses.  For time t the pool also keeps a reverse
+index from every presynaptic cell to its synapses, so only the synapses of the
+(few) currently active cells need to be visited.
+
+The segments and synapses are still represented by DistalSegment and
+DistalSynapse objects so the rest of the temporal pooler (and the region
+visualizer) can continue to walk them, but their permanences live in the pool
+and their activity is read from the pool's per time step counts.  The pool
+serves as the Region's segmentActivity cache when the Region is in arrays mode.
+"""
+
+import numpy
+from HTM.Segment import Segment
+from HTM.Synapse import Synapse
+
+#Kinds of per-segment synapse counts computed by DistalPool.getCounts
+ACTIVE = 'active'                 #connected synapses active at t
+POTENTIAL = 'potential'           #all synapses active at t
+PREV_ACTIVE = 'prevActive'        #connected synapses active at t-1
+PREV_POTENTIAL = 'prevPotential'  #all synapses active at t-1
+PREV_LEARNING = 'prevLearning'    #connected synapses active and learning at t-1
+
+INITIAL_CAPACITY = 1024
+DEAD_PERMANENCE = -1.0 #marks removed synapses until the pool is compacted
+
+class DistalPool(object):
+  """
+  Hold the distal segments and synapses of all Cells in a Region as numpy arrays.
+  """
+
+  def __init__(self, region):
+    """
+    Create an empty pool for the given region.
+    @param region: the parent Region whose Cells own the segments.
+    """
+    self.region = region
+    self.numSynapses = 0
+    #flat index (column.index*cellsPerCol + cell.index) of each presynaptic cell
+    self.presynaptic = numpy.zeros(INITIAL_CAPACITY, dtype=numpy.int32)
+    self.permanence = numpy.zeros(INITIAL_CAPACITY)
+    self.synapseSegment = numpy.zeros(INITIAL_CAPACITY, dtype=numpy.int32)
+
+    self.segments = [] #DistalSegment objects (None once removed), indexed by id
+    self.numDead = 0 #removed synapses still occupying the pool arrays
+    self.cellSynapses = {} #flat presynaptic cell index -> list of synapse ids
+    self.counts = {} #per-segment synapse counts cached for the current state
+
+  def getCellIndex(self, cell):
+    """ Return the flat index of the cell within the Region's cell state arrays. """
+    return cell.column.index*self.region.cellsPerCol + cell.index
+
+  def createSegment(self, cell):
+    """
+    Create a new (empty) distal segment for the specified cell.
+    @return the new DistalSegment.
+    """
+    segment = DistalSegment(self, len(self.segments), cell)
+    self.segments.append(segment)
+    self.counts.clear()
+    return segment
+
+  def addSynapse(self, segment, inputSource, permanence):
+    """
+    Add a new synapse to the pool for the given segment.
+    @param segment: the DistalSegment the synapse belongs to.
+    @param inputSource: the presynaptic Cell of the new synapse.
+    @param permanence: the synapse's initial permanence value (0.0-1.0).
+    @return the id (index into the pool arrays) of the new synapse.
+    """
+    if self.numSynapses==len(self.permanence):
+      self.__grow(2*len(self.permanence))
+    i = self.numSynapses
+    cellIndex = self.getCellIndex(inputSource)
+    self.presynaptic[i] = cellIndex
+    self.cellSynapses.setdefault(cellIndex, []).append(i)
+    self.permanence[i] = min(1.0, permanence) #clamp permanence to 1.0
+    self.synapseSegment[i] = segment.id
+    self.numSynapses += 1
+    self.counts.clear()
+    return i
+
+  def __grow(self, capacity):
+    """ Increase the capacity of the synapse arrays. """
+    n = self.numSynapses
+    for name in ('presynaptic', 'permanence', 'synapseSegment'):
+      old = getattr(self, name)
+      new = numpy.zeros(capacity, dtype=old.dtype)
+      new[:n] = old[:n]
+      setattr(self, name, new)
+
+  def removeSynapses(self, segment, synapses):
+    """
+    Remove synapses that were removed from the segment from the pool.  The
+    synapses are marked dead with DEAD_PERMANENCE and their views are given
+    id -1.  Once more than half of the pool is dead it is compacted.
+    @param segment: the DistalSegment the synapses were removed from.
+    @param synapses: list of the removed DistalSynapse views.
+    """
+    for syn in synapses:
+      self.cellSynapses[self.presynaptic[syn.id]].remove(syn.id)
+      self.permanence[syn.id] = DEAD_PERMANENCE
+      syn.id = -1
+    self.numDead += len(synapses)
+    self.counts.clear()
+    if self.numDead*2 > self.numSynapses:
+      self.compact()
+
+  def removeSegment(self, segment):
+    """ Remove a segment from the pool (its synapses must already be removed). """
+    self.segments[segment.id] = None
+    self.counts.clear()
+
+  def compact(self):
+    """
+    Discard the dead synapses and removed segments from the pool, renumbering
+    the remaining synapses and segments (and updating the ids of their views).
+    """
+    n = self.numSynapses
+    live = numpy.flatnonzero(self.permanence[:n] != DEAD_PERMANENCE)
+    numLive = len(live)
+    newIds = numpy.zeros(n, dtype=numpy.int32)
+    newIds[live] = numpy.arange(numLive)
+
+    segments = [seg for seg in self.segments if seg is not None]
+    newSegIds = numpy.zeros(len(self.segments), dtype=numpy.int32)
+    for i, seg in enumerate(segments):
+      newSegIds[seg.id] = i
+      seg.id = i
+
+    for name in ('presynaptic', 'permanence', 'synapseSegment'):
+      array = getattr(self, name)
+      array[:numLive] = array[live]
+    self.synapseSegment[:numLive] = newSegIds.take(self.synapseSegment[:numLive])
+    self.numSynapses = numLive
+    self.numDead = 0
+
+    for seg in segments:
+      seg.synapseIds = newIds.take(seg.synapseIds).tolist()
+      for syn, i in zip(seg.synapses, seg.synapseIds):
+        syn.id = i
+    self.segments = segments
+
+    self.cellSynapses = {}
+    for i, cellIndex in enumerate(self.presynaptic[:numLive].tolist()):
+      self.cellSynapses.setdefault(cellIndex, []).append(i)
+    self.counts.clear()
+
+  def invalidate(self, previous=True):
+    """
+    Discard cached segment counts after the cell states changed.
+    @param previous: if False only the counts at time t are discarded.
+    """
+    if previous:
+      self.counts.clear()
+    else:
+      self.counts.pop(ACTIVE, None)
+      self.counts.pop(POTENTIAL, None)
+
+  def discard(self, segment):
+    """ Discard cached counts after the synapses of the segment changed. """
+    self.counts.clear()
+
+  def getCellSynapses(self, cells):
+    """
+    Return an array of the ids of all synapses whose presynaptic cell is one
+    of the given cells, using the reverse presynaptic cell index.
+    @param cells: flat indices (column.index*cellsPerCol + cell.index) of cells.
+    """
+    ids = []
+    cellSynapses = self.cellSynapses
+    for i in cells:
+      ids.extend(cellSynapses.get(i, ()))
+    return numpy.array(ids, dtype=numpy.int32)
+
+  def getActiveSegments(self):
+    """ Return a list of all the DistalSegments that are active at time t. """
+    counts = self.getCounts(ACTIVE)
+    active = numpy.flatnonzero(counts >= self.region.segActiveThreshold)
+    return [self.segments[i] for i in active]
+
+  def getActiveMask(self, synapseIds, kind):
+    """
+    Return a boolean array marking which of the given synapses are active for
+    the given kind of count.
+    @param synapseIds: array of synapse ids (indices into the pool arrays).
+    @param kind: one of ACTIVE, POTENTIAL, PREV_ACTIVE, PREV_POTENTIAL or
+    PREV_LEARNING.
+    """
+    region = self.region
+    if kind==ACTIVE or kind==POTENTIAL:
+      states = region.cellActive.ravel()
+    elif kind==PREV_LEARNING:
+      states = (region.cellWasActive & region.cellWasLearning).ravel()
+    else:
+      states = region.cellWasActive.ravel()
+    active = states.take(self.presynaptic.take(synapseIds))
+    if kind!=POTENTIAL and kind!=PREV_POTENTIAL:
+      active &= self.permanence.take(synapseIds) >= Synapse.CONNECTED_PERM
+    else:
+      active &= self.permanence.take(synapseIds) != DEAD_PERMANENCE
+    return active
+
+  def getCounts(self, kind):
+    """
+    Return an array (indexed by segment id) with the number of synapses of
+    every segment that are active for the given kind of count.
+    The counts are computed with one bincount over the whole pool and then
+    cached until invalidated (at the latest on the next time step).  Counts
+    at time t only visit the synapses of currently active cells.
+    @param kind: one of ACTIVE, POTENTIAL, PREV_ACTIVE, PREV_POTENTIAL or
+    PREV_LEARNING.
+    """
+    counts = self.counts.get(kind)
+    if counts is None:
+      if kind==ACTIVE or kind==POTENTIAL:
+        cells = numpy.flatnonzero(self.region.cellActive)
+        ids = self.getCellSynapses(cells)
+        if kind==ACTIVE:
+          ids = ids[self.permanence.take(ids) >= Synapse.CONNECTED_PERM]
+      else:
+        ids = numpy.flatnonzero(self.getActiveMask(numpy.arange(self.numSynapses), kind))
+      counts = numpy.bincount(self.synapseSegment.take(ids), \
+                              minlength=len(self.segments))
+      self.counts[kind] = counts
+    return counts
+
+
+class DistalSynapse(Synapse):
+  """
+  A distal Synapse whose permanence lives in a DistalPool.
+  """
+
+  __slots__ = ('pool', 'id')
+
+  def __init__(self, pool, id, inputSource):
+    self.pool = pool
+    self.id = id
+    self.inputSource = inputSource
+
+  def getPermanence(self):
+    return self.pool.permanence[self.id]
+
+  def setPermanence(self, permanence):
+    self.pool.permanence[self.id] = permanence
+    self.pool.counts.clear()
+
+  permanence = property(getPermanence, setPermanence)
+
+
+class DistalSegment(Segment):
+  """
+  A distal Segment whose synapses are stored within a DistalPool.  Whether
+  the segment is (or was) active is read from the pool's segment counts, and
+  its lists of active synapses are found from the pool arrays.
+  """
+
+  __slots__ = ('pool', 'id', 'synapseIds')
+
+  def __init__(self, pool, id, cell):
+    super(DistalSegment, self).__init__(pool.region.segActiveThreshold, cell=cell)
+    self.pool = pool
+    self.id = id
+    self.synapseIds = [] #pool ids of the synapses, in the order of synapses
+
+  def createSynapse(self, inputSource):
+    """
+    Create a new synapse for this segment attached to the specified input source.
+    @param inputSource: the presynaptic Cell of the synapse to create.
+    @return the newly created synapse.
+    """
+    i = self.pool.addSynapse(self, inputSource, Synapse.INITIAL_PERMANENCE)
+    newSyn = DistalSynapse(self.pool, i, inputSource)
+    self.synapses.append(newSyn)
+    self.synapseIds.append(i)
+    return newSyn
+
+  def addSynapse(self, synapse):
+    """ Add a synapse to this segment's pool attached to the synapse's input source. """
+    i = self.pool.addSynapse(self, synapse.inputSource, synapse.permanence)
+    self.synapses.append(DistalSynapse(self.pool, i, synapse.inputSource))
+    self.synapseIds.append(i)
+
+  def adaptSynapses(self, activeSynapses, positiveReinforcement):
+    """
+    Reinforce the synapses of this segment given the list of its synapses that
+    were active for a segment update (see Segment.adaptSynapses).  The new
+    permanences of all the segment's synapses are computed and clipped to
+    0.0-1.0 at once within the pool arrays.
+    @param activeSynapses: list of this segment's synapses that were active.
+    @param positiveReinforcement: true to reinforce, false to only punish.
+    """
+    pool = self.pool
+    #synapses removed since the update was queued have an id of -1
+    activeIds = numpy.array([syn.id for syn in activeSynapses if syn.id >= 0], \
+                            dtype=numpy.int32)
+    if positiveReinforcement:
+      ids = numpy.array(self.synapseIds, dtype=numpy.int32)
+      delta = numpy.where(numpy.in1d(ids, activeIds), \
+                          Synapse.PERMANENCE_INC, -Synapse.PERMANENCE_DEC)
+    else:
+      ids = activeIds
+      delta = -Synapse.PERMANENCE_DEC
+    perms = pool.permanence.take(ids) + delta
+    numpy.clip(perms, 0.0, 1.0, perms)
+    pool.permanence[ids] = perms
+    pool.discard(self)
+
+  def removeSynapses(self, synapses):
+    """
+    Remove the specified synapses from this segment and the pool.
+    @param synapses: list of this segment's synapses to remove.
+    """
+    removed = set(synapses)
+    keep = [i for i, syn in enumerate(self.synapses) if syn not in removed]
+    self.synapses = [self.synapses[i] for i in keep]
+    self.synapseIds = [self.synapseIds[i] for i in keep]
+    self.pool.removeSynapses(self, synapses)
+
+  def __getSynapses(self, kind):
+    """ Return the list of this segment's synapses active for the kind of count. """
+    if not self.synapseIds:
+      return []
+    active = self.pool.getActiveMask(numpy.array(self.synapseIds), kind)
+    return [self.synapses[i] for i in numpy.flatnonzero(active)]
+
+  def getActiveSynapses(self, connectedOnly=True):
+    """
+    Return a list of all the currently active (firing) synapses on this segment.
+    @param connectedOnly: only consider if active if a synapse is connected.
+    """
+    return self.__getSynapses(ACTIVE if connectedOnly else POTENTIAL)
+
+  def getPrevActiveSynapses(self, connectedOnly=True):
+    """
+    Return a list of all the previously active (firing) synapses on this segment.
+    @param connectedOnly: only consider if active if a synapse is connected.
+    """
+    return self.__getSynapses(PREV_ACTIVE if connectedOnly else PREV_POTENTIAL)
+
+  def getActiveCount(self, connectedOnly=True):
+    """
+    Return the number of currently active (firing) synapses on this segment.
+    @param connectedOnly: only count a synapse as active if it is connected.
+    """
+    return self.pool.getCounts(ACTIVE if connectedOnly else POTENTIAL)[self.id]
+
+  def getPrevActiveCount(self, connectedOnly=True):
+    """
+    Return the number of previously active (firing) synapses on this segment.
+    @param connectedOnly: only count a synapse as active if it is connected.
+    """
+    return self.pool.getCounts(PREV_ACTIVE if connectedOnly else PREV_POTENTIAL)[self.id]
+
+  def getPrevLearningCount(self):
+    """
+    Return the number of connected synapses on this segment that were active
+    due to learning states at time t-1.
+    """
+    return self.pool.getCounts(PREV_LEARNING)[self.id]
@@ -0,0 +1,292 @@
+"""
+Created on Oct 16, 2026
+
+An inference-only snapshot of a trained HTM Region.
+
+A Region that no longer learns still walks its Column, Cell, Segment and
+Synapse objects every time step, checking the permanence of every synapse
+against the connected threshold as it goes.  Once training is complete none
+of that structure changes, so a FrozenRegion (see Region.freeze) compiles it
+into read-only compressed sparse row (CSR) index arrays that hold only the
+connected synapses:
+
+proximal: for every input bit, the Columns with a connected proximal synapse
+  on that bit.  The overlap of every Column is then a bincount over the
+  Columns of just the active input bits.
+distal: for every cell, the distal segments with a connected synapse from
+  that cell.  The active segments at time t are then a bincount over the
+  segments of just the active cells.
+
+The FrozenRegion runs the same spatial and temporal pooling inference as the
+Region with spatialLearning and temporalLearning both off, but skips every
+learning code path: no segment updates are queued, and the duty cycles,
+boosts and inhibition radius stay fixed at their values when frozen.
+"""
+
+import numpy
+from HTM.Synapse import Synapse
+from HTM.Inhibition import Inhibition
+
+def _buildIndex(keys, values, numKeys):
+  """
+  Return the (indptr, values) arrays of a CSR index where the values of key k
+  are values[indptr[k]:indptr[k+1]] (kept in their original relative order).
+  @param keys: array of the key of every value.
+  @param values: array of the values to index.
+  @param numKeys: the number of possible keys (0 to numKeys-1).
+  """
+  keys = numpy.asarray(keys, dtype=numpy.int32)
+  order = numpy.argsort(keys, kind='mergesort')
+  values = numpy.asarray(values, dtype=numpy.int32)[order]
+  indptr = numpy.searchsorted(keys[order], numpy.arange(numKeys+1)).astype(numpy.int32)
+  indptr.flags.writeable = False
+  values.flags.writeable = False
+  return indptr, values
+
+def _gatherRows(indptr, values, rows):
+  """
+  Return the concatenated values of all the given rows of a CSR index.
+  @param indptr: row start offsets of the index (see _buildIndex).
+  @param values: the indexed values.
+  @param rows: array of the rows (keys) to gather.
+  """
+  starts = indptr[rows]
+  lengths = indptr[rows+1] - starts
+  #concatenate the index ranges [start, start+length) of all the rows
+  total = lengths.sum()
+  offsets = numpy.repeat(starts - (numpy.cumsum(lengths)-lengths), lengths)
+  return values[offsets + numpy.arange(total)]
+
+
+#scalar parameters, compiled read-only arrays, and cell state arrays that
+#fully describe a FrozenRegion (see getState and fromState)
+STATE_NAMES = ('inputWidth', 'inputHeight', 'width', 'height', 'cellsPerCol', 
+               'minOverlap', 'desiredLocalActivity', 'inhibitionRadius', 
+               'segActiveThreshold', 'outShape')
+ARRAY_NAMES = ('boostGrid', 'outIndex', 'proximalIndptr', 'proximalColumns', 
+               'segmentCell', 'segmentSequence', 'distalIndptr', 'distalSegments')
+CELL_STATE_NAMES = ('activeGrid', 'cellActive', 'cellPredicting', 
+                    'cellSequencePredicting')
+
+class FrozenRegion(object):
+  """
+  Represent a trained HTM Region compiled for inference only.
+  """
+
+  def __init__(self, region):
+    """
+    Snapshot the connectivity and state of the given Region.  Synapses are
+    judged connected using the value of Synapse.CONNECTED_PERM at this time.
+    @param region: the trained Region to freeze (it is not modified and may
+    continue to be run or trained independently afterwards).
+    """
+    self.inputWidth = region.inputWidth
+    self.inputHeight = region.inputHeight
+    self.width = region.width
+    self.height = region.height
+    self.cellsPerCol = region.cellsPerCol
+    self.minOverlap = region.minOverlap
+    self.desiredLocalActivity = region.desiredLocalActivity
+    self.inhibitionRadius = int(round(region.inhibitionRadius))
+    self.segActiveThreshold = region.segActiveThreshold
+    self.outShape = region.outData.shape
+
+    self.boostGrid = region.boostGrid.copy()
+    self.boostGrid.flags.writeable = False
+    self.outIndex = region.outIndex
+    self.__compileProximal(region)
+    self.__compileDistal(region)
+
+    self.activeGrid = region.activeGrid.copy()
+    self.cellActive = region.cellActive.copy()
+    self.cellPredicting = region.cellPredicting.copy()
+    self.__allocate()
+    self.inputData[...] = region.inputData
+
+    #cells predicted at t-1 by an active sequence segment, which are the
+    #cells that become active if their column is active at t
+    self.cellSequencePredicting = numpy.zeros_like(self.cellPredicting)
+    self.__computePredictions(numpy.zeros_like(self.cellPredicting), \
+                              self.cellSequencePredicting)
+    self.cellSequencePredicting &= region.cellPredicting
+
+  @classmethod
+  def fromState(cls, state, arrays):
+    """
+    Create a FrozenRegion from the state previously returned by getState.
+    The compiled arrays are used as given (so they may be read-only memory
+    maps shared between processes), the cell state arrays are copied.
+    @param state: dict of the scalar parameters named in STATE_NAMES.
+    @param arrays: dict of the arrays named in ARRAY_NAMES and CELL_STATE_NAMES.
+    """
+    frozen = cls.__new__(cls)
+    for name in STATE_NAMES:
+      setattr(frozen, name, state[name])
+    frozen.outShape = tuple(frozen.outShape)
+    for name in ARRAY_NAMES:
+      setattr(frozen, name, arrays[name])
+    for name in CELL_STATE_NAMES:
+      setattr(frozen, name, numpy.array(arrays[name]))
+    frozen.__allocate()
+    return frozen
+
+  def getState(self):
+    """
+    Return a tuple of a dict of this FrozenRegion's scalar parameters and a
+    dict of its compiled and cell state arrays (see fromState).
+    """
+    state = dict((name, getattr(self, name)) for name in STATE_NAMES)
+    arrays = dict((name, getattr(self, name)) for name in ARRAY_NAMES+CELL_STATE_NAMES)
+    return state, arrays
+
+  def __allocate(self):
+    """ Allocate the input, overlap and output buffers used while running. """
+    self.inputData = numpy.zeros((self.inputWidth, self.inputHeight), dtype=numpy.uint8)
+    self.inputBits = None
+    self.overlapGrid = numpy.zeros((self.width, self.height))
+    self.outData = numpy.zeros(self.outShape, dtype=numpy.uint8)
+    self.inhibition = Inhibition(self.width, self.height)
+
+  def __compileProximal(self, region):
+    """
+    Build the CSR index from every input bit to the columns with a connected
+    proximal synapse on the bit.
+    """
+    if region.proximalPool:
+      pool = region.proximalPool
+      connected = pool.getConnected()
+      bits = pool.inputIndex[connected]
+      cols = numpy.nonzero(connected)[0]
+    else:
+      bits = []
+      cols = []
+      for col in region.columns:
+        for syn in col.proximalSegment.synapses:
+          if syn.permanence >= Synapse.CONNECTED_PERM:
+            bits.append(syn.inputSource.ix*self.inputHeight + syn.inputSource.iy)
+            cols.append(col.index)
+    numBits = self.inputWidth*self.inputHeight
+    self.proximalIndptr, self.proximalColumns = _buildIndex(bits, cols, numBits)
+
+  def __compileDistal(self, region):
+    """
+    Build the CSR index from every cell to the distal segments with a connected
+    synapse from the cell, along with the owning cell and sequence flag of
+    every segment.
+    """
+    cpc = self.cellsPerCol
+    segmentCell = []
+    segmentSequence = []
+    presynaptic = []
+    synapseSegment = []
+    for col in region.columns:
+      for cell in col.cells:
+        for seg in cell.segments:
+          segId = len(segmentCell)
+          segmentCell.append(col.index*cpc + cell.index)
+          segmentSequence.append(seg.isSequence)
+          for syn in seg.synapses:
+            if syn.permanence >= Synapse.CONNECTED_PERM:
+              source = syn.inputSource
+              presynaptic.append(source.column.index*cpc + source.index)
+              synapseSegment.append(segId)
+
+    self.segmentCell = numpy.array(segmentCell, dtype=numpy.int32)
+    self.segmentSequence = numpy.array(segmentSequence, dtype=numpy.bool_)
+    self.segmentCell.flags.writeable = False
+    self.segmentSequence.flags.writeable = False
+    self.distalIndptr, self.distalSegments = \
+      _buildIndex(presynaptic, synapseSegment, region.cellActive.size)
+
+  def runOnce(self):
+    """
+    Run one (inference only) time step for this FrozenRegion using the current
+    inputData, computing the active columns and the active and predicting cells.
+    """
+    self.__performSpatialPooling()
+    self.__performTemporalPooling()
+
+  def __performSpatialPooling(self):
+    """
+    Compute the column overlaps from the active input bits and the winning
+    columns after inhibition (Region spatial pooling Phases 1 and 2).
+    """
+    bits = self.inputBits
+    if bits is None:
+      bits = numpy.flatnonzero(self.inputData)
+    cols = _gatherRows(self.proximalIndptr, self.proximalColumns, bits)
+    activeCounts = numpy.bincount(cols, minlength=self.overlapGrid.size)
+    activeCounts = activeCounts.reshape(self.overlapGrid.shape)
+    self.overlapGrid[:] = numpy.where(activeCounts < self.minOverlap, 0, \
+                                      activeCounts*self.boostGrid)
+    self.activeGrid[:] = self.inhibition.getActiveColumns(self.overlapGrid, \
+                           self.inhibitionRadius, self.desiredLocalActivity)
+
+  def __performTemporalPooling(self):
+    """
+    Compute the active cells of the winning columns and the predicting cells
+    (Region temporal pooling Phases 1 and 2 without learning).  The cells of
+    an active column that were predicted by a sequence segment become active,
+    or if there were none all of the column's cells become active.
+    """
+    activeCols = numpy.flatnonzero(self.activeGrid)
+    predicted = self.cellSequencePredicting[activeCols]
+    buPredicted = predicted.any(axis=1)
+    self.cellActive.fill(False)
+    self.cellActive[activeCols] = predicted | ~buPredicted[:,None]
+
+    self.__computePredictions(self.cellPredicting, self.cellSequencePredicting)
+
+  def __computePredictions(self, predicting, sequencePredicting):
+    """
+    Find the cells with an active distal segment given the current active cells.
+    @param predicting: cell state array to set for the cells with any active
+    segment (all other cells are cleared).
+    @param sequencePredicting: cell state array to set for the cells with an
+    active sequence segment (all other cells are cleared).
+    """
+    cells = numpy.flatnonzero(self.cellActive)
+    segs = _gatherRows(self.distalIndptr, self.distalSegments, cells)
+    counts = numpy.bincount(segs, minlength=len(self.segmentCell))
+    activeSegs = numpy.flatnonzero(counts >= self.segActiveThreshold)
+
+    predicting.fill(False)
+    predicting.ravel()[self.segmentCell.take(activeSegs)] = True
+    sequencePredicting.fill(False)
+    sequenceSegs = activeSegs[self.segmentSequence.take(activeSegs)]
+    sequencePredicting.ravel()[self.segmentCell.take(sequenceSegs)] = True
+
+  def updateInput(self, newInput):
+    """
+    Update the inputData of this FrozenRegion by copying the newInput matrix,
+    or from the flat indices of the active input bits if newInput is 1d.
+    @param newInput: 2d numpy matrix (or 1d array of active bit indices) to
+    use for the next time step.
+    """
+    if numpy.ndim(newInput)==1:
+      activeBits = numpy.asarray(newInput, dtype=numpy.int32)
+      flat = self.inputData.reshape(-1)
+      flat.fill(0)
+      flat[activeBits] = 1
+      self.inputBits = activeBits
+      return
+    assert newInput.shape==self.inputData.shape
+    self.inputData[...] = newInput
+    self.inputBits = None
+
+  def getSparseOutput(self):
+    """
+    Return a sorted 1d array of the flat indices of the set bits of the output
+    bit-matrix (see getOutput), which are the active or predicting cells.
+    """
+    cells = numpy.flatnonzero(self.cellActive | self.cellPredicting)
+    return numpy.sort(self.outIndex.take(cells))
+
+  def getOutput(self):
+    """
+    Return the output bit-matrix of the most recently run time step, laid out
+    the same as the output of the Region this was frozen from.
+    """
+    self.outData.fill(0)
+    self.outData.reshape(-1)[self.getSparseOutput()] = 1
+    return self.outData
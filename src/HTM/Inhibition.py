@@ -0,0 +1,169 @@
+"""
+Created on Oct 16, 2026
+
+Grid-wide lateral inhibition for the spatial pooler of an HTM Region.
+
+From the Numenta docs, a column is a winner after inhibition if its overlap
+score is greater than or equal to the score of the desiredLocalActivity'th
+highest column within its inhibition radius.  Rather than building and sorting
+the list of neighbor overlaps for each column in turn, the neighborhoods of
+all columns are gathered at once from the 2d grid of overlaps using a table
+of neighbor indices precomputed for the current inhibition radius, and the
+k'th highest score of each neighborhood is found with a partial selection.
+
+When the inhibition radius covers the entire column grid every column shares
+the same neighborhood, so a single selection over all overlaps is enough.
+
+The module also provides neighborhoodMax(), a sliding window maximum filter
+over the column grid used to find the highest duty cycle near each column.
+"""
+
+import numpy
+
+MAX_CHUNK_SIZE = 1<<20 #max number of neighbor overlaps to gather at once
+
+def neighborhoodMax(grid, radius):
+  """
+  Return a grid holding, for every column, the maximum value of the given
+  grid within radius of the column (the same neighborhood as returned by
+  Region.neighbors for the current inhibition radius).
+  @param grid: 2d (width x height) array of column values.
+  @param radius: the (integer) inhibition radius in column grid space.
+  """
+  radius = max(1, radius) #neighborhoods always include adjacent columns
+  return _windowMax(_windowMax(grid, radius).T, radius).T
+
+def _windowMax(a, radius):
+  """
+  Return the maximum of a[i-radius:i+radius+1] (clipped to the array bounds)
+  for every i along the first axis of a.  Windows of doubling length are
+  combined so the cost grows with log(radius) rather than radius.
+  """
+  n = len(a)
+  radius = min(radius, n-1)
+  if radius <= 0:
+    return a.copy()
+  padded = numpy.empty((n+2*radius,)+a.shape[1:])
+  padded.fill(-numpy.inf)
+  padded[radius:radius+n] = a
+  size = 2*radius + 1
+  #m[i] is the max of padded[i:i+w]
+  m = padded
+  w = 1
+  while w*2 <= size:
+    m = numpy.maximum(m[:-w], m[w:])
+    w *= 2
+  return numpy.maximum(m[:n], m[size-w:size-w+n])
+
+
+class Inhibition(object):
+  """
+  Compute the winning columns of a Region's column grid after inhibition.
+  """
+  
+  def __init__(self, width, height):
+    """
+    @param width: number of columns in the x direction of the column grid.
+    @param height: number of columns in the y direction of the column grid.
+    """
+    self.width = width
+    self.height = height
+    self.radius = None #radius the current neighbor table was built for
+    self.neighborTable = None
+    self.neighborCounts = None
+  
+  def coversGrid(self, radius):
+    """
+    Return true if the neighborhood of every column spans the entire grid
+    for the given inhibition radius.
+    """
+    return radius >= self.width-1 and radius >= self.height-1
+  
+  def getNeighborTable(self, radius):
+    """
+    Return the table of neighbor indices for the given inhibition radius.
+    Row i of the table holds the flat grid indices (x*height + y) of all the
+    columns within radius of the i'th column (including itself).  Rows of
+    columns near the grid edges are padded with the index width*height which
+    refers to an extra 'missing' column.  The table is cached so it is only
+    rebuilt when the radius changes.
+    @param radius: the (integer) inhibition radius in column grid space.
+    """
+    if radius!=self.radius:
+      w, h = self.width, self.height
+      rx = min(radius, w-1)
+      ry = min(radius, h-1)
+      xs = numpy.arange(w)[:,None] + numpy.arange(-rx, rx+1)
+      ys = numpy.arange(h)[:,None] + numpy.arange(-ry, ry+1)
+      validX = (xs >= 0) & (xs < w)
+      validY = (ys >= 0) & (ys < h)
+      table = xs[:,None,:,None]*h + ys[None,:,None,:]
+      valid = validX[:,None,:,None] & validY[None,:,None,:]
+      table = numpy.where(valid, table, w*h).astype(numpy.int32)
+      self.neighborTable = table.reshape(w*h, -1)
+      self.neighborCounts = valid.reshape(w*h, -1).sum(axis=1)
+      self.radius = radius
+    return self.neighborTable
+  
+  def kthScores(self, overlaps, cols, k):
+    """
+    Return the k'th highest overlap within the neighborhood of each column
+    of cols.  If a neighborhood holds fewer than k columns, the lowest overlap
+    of the neighborhood is used instead.
+    @param overlaps: flat array of all column overlaps plus a trailing -inf
+    entry for the 'missing' column used to pad the neighbor table.
+    @param cols: flat grid indices of the columns to compute scores for.
+    @param k: which highest score to select from each neighborhood.
+    """
+    table = self.neighborTable
+    size = table.shape[1]
+    scores = numpy.empty(len(cols))
+    chunk = max(1, MAX_CHUNK_SIZE / size)
+    for i in xrange(0, len(cols), chunk):
+      rows = cols[i:i+chunk]
+      #negate so the padding becomes +inf and sorts after every real overlap
+      values = -overlaps.take(table[rows])
+      if k <= size:
+        kth = -numpy.partition(values, k-1, axis=1)[:,k-1]
+      else:
+        kth = numpy.empty(len(rows))
+        kth.fill(-numpy.inf)
+      #neighborhoods smaller than k instead use their lowest overlap
+      small = self.neighborCounts[rows] < k
+      if small.any():
+        values = values[small]
+        values[numpy.isinf(values)] = -numpy.inf
+        kth[small] = -values.max(axis=1)
+      scores[i:i+chunk] = kth
+    return scores
+  
+  def getActiveColumns(self, overlapGrid, radius, desiredLocalActivity):
+    """
+    Return a 2d boolean grid of the columns that remain winners after
+    inhibition.  A column wins if its overlap is nonzero and at least the
+    desiredLocalActivity'th highest overlap within its inhibition radius.
+    @param overlapGrid: 2d (width x height) array of the column overlaps.
+    @param radius: the (integer) inhibition radius in column grid space.
+    @param desiredLocalActivity: number of winners wanted per neighborhood.
+    """
+    radius = max(1, radius) #neighborhoods always include adjacent columns
+    k = desiredLocalActivity
+    flat = overlapGrid.ravel()
+    active = numpy.zeros(flat.shape, dtype=numpy.bool_)
+  
+    if self.coversGrid(radius):
+      #every neighborhood is the whole grid, one selection serves all columns
+      n = len(flat)
+      if k <= n:
+        kth = numpy.partition(flat, n-k)[n-k]
+      else:
+        kth = flat.min()
+      active[:] = (flat > 0) & (flat >= kth)
+      return active.reshape(overlapGrid.shape)
+  
+    self.getNeighborTable(radius)
+    cols = numpy.flatnonzero(flat > 0)
+    if len(cols) > 0:
+      overlaps = numpy.append(flat, -numpy.inf)
+      active[cols] = flat[cols] >= self.kthScores(overlaps, cols, k)
+    return active.reshape(overlapGrid.shape)
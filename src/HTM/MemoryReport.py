@@ -0,0 +1,129 @@
+"""
+Created on Oct 16, 2026
+
+Report the memory used by the objects and arrays of an HTM Region.
+
+The report walks every Column, Cell, Segment, Synapse and InputCell reachable
+from a Region and totals the size of each instance along with the lists that
+hold them, and adds the numpy arrays owned by the Region and its pools.
+
+For comparison, the report also estimates what the same Region would use in
+the original object layout: every instance carrying its own __dict__ rather
+than __slots__, and one InputCell allocated per proximal synapse rather than
+one shared InputCell per input bit.
+"""
+
+import sys
+import numpy
+
+class _PlainObject(object):
+  """ An object with a per-instance __dict__ used to size the dict layout. """
+  pass
+
+_PLAIN_OBJECT_SIZE = sys.getsizeof(_PlainObject())
+
+def getSlotNames(obj):
+  """ Return the names of all the __slots__ declared by the object's classes. """
+  names = []
+  for cls in type(obj).__mro__:
+    slots = cls.__dict__.get('__slots__', ())
+    if isinstance(slots, str):
+      slots = (slots,)
+    names.extend(slots)
+  return names
+
+def getObjectSize(obj):
+  """
+  Return a tuple of the number of bytes used by the object in its current
+  layout, and the estimated bytes if it stored its attributes in a __dict__.
+  """
+  size = sys.getsizeof(obj)
+  if hasattr(obj, '__dict__'):
+    size += sys.getsizeof(obj.__dict__)
+  names = getSlotNames(obj)
+  if not names:
+    return size, size
+  attrs = dict.fromkeys(names)
+  if hasattr(obj, '__dict__'):
+    attrs.update(obj.__dict__)
+  return size, _PLAIN_OBJECT_SIZE + sys.getsizeof(attrs)
+
+def getMemoryReport(region):
+  """
+  Return a dict mapping each kind of Region storage ('Column', 'Cell',
+  'Segment', 'Synapse', 'InputCell', 'lists' and 'arrays') to a list of
+  [count, bytes, dictBytes].  The bytes are for the current layout and the
+  dictBytes estimate the original layout (per-instance __dict__ and unshared
+  InputCells).  Proximal synapses stored in a ProximalPool are counted within
+  the arrays only.
+  """
+  report = {}
+  for kind in ('Column', 'Cell', 'Segment', 'Synapse', 'InputCell', 'lists', 'arrays'):
+    report[kind] = [0, 0, 0]
+
+  def add(kind, size, dictSize, count=1):
+    entry = report[kind]
+    entry[0] += count
+    entry[1] += size
+    entry[2] += dictSize
+
+  def addObject(kind, obj):
+    size, dictSize = getObjectSize(obj)
+    add(kind, size, dictSize)
+
+  def addList(items):
+    size = sys.getsizeof(items)
+    add('lists', size, size)
+
+  seenInputs = set()
+  def addSegment(segment):
+    addObject('Segment', segment)
+    addList(segment.synapses)
+    for syn in segment.synapses:
+      addObject('Synapse', syn)
+      source = syn.inputSource
+      if not hasattr(source, 'column'): #an InputCell rather than a Cell
+        size, dictSize = getObjectSize(source)
+        if id(source) in seenInputs:
+          size = 0
+        seenInputs.add(id(source))
+        add('InputCell', size, dictSize, count=0)
+
+  addList(region.columns)
+  for col in region.columns:
+    addObject('Column', col)
+    addList(col.cells)
+    if region.proximalPool is None:
+      addSegment(col.proximalSegment)
+    for cell in col.cells:
+      addObject('Cell', cell)
+      addList(cell.segments)
+      for seg in cell.segments:
+        addSegment(seg)
+  report['InputCell'][0] = len(seenInputs)
+
+  for owner in (region, region.proximalPool, region.distalPool):
+    if owner is None:
+      continue
+    for value in owner.__dict__.itervalues():
+      if isinstance(value, numpy.ndarray):
+        add('arrays', value.nbytes, value.nbytes)
+  return report
+
+def printMemoryReport(region):
+  """
+  Print a table comparing the memory used by the Region's objects and arrays
+  to the estimated memory of the original object layout.
+  """
+  report = getMemoryReport(region)
+  totalSize = 0
+  totalDictSize = 0
+  print "%-10s %10s %14s %14s" % ("storage", "count", "bytes", "dict bytes")
+  for kind in ('Column', 'Cell', 'Segment', 'Synapse', 'InputCell', 'lists', 'arrays'):
+    count, size, dictSize = report[kind]
+    totalSize += size
+    totalDictSize += dictSize
+    print "%-10s %10d %14d %14d" % (kind, count, size, dictSize)
+  print "%-10s %10s %14d %14d" % ("total", "", totalSize, totalDictSize)
+  if totalDictSize > 0:
+    print "compact layout uses %.1f%% of the original" % (100.0*totalSize/totalDictSize)
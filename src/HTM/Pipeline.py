@@ -0,0 +1,306 @@
+"""
+Created on Oct 16, 2026
+
+Pipelined execution of a hierarchy of HTM Regions across worker processes.
+
+Running the Regions of a hierarchy one after the other for every frame makes
+the time per frame the sum of the times of all the Regions.  The
+PipelineExecutor instead runs every Region in its own worker process, so
+while Region N works on frame t, Region N+1 is already working on frame t-1,
+and the throughput approaches that of the slowest single Region.
+
+Each Region hands its sparse output (see Region.getSparseOutput) to the next
+through a SharedRing: slots of shared memory that hold the active bit indices
+of one frame each, so no data is pickled between the processes.  A ring runs
+in one of two modes:
+
+lockstep: a ring of slots guarded by counting semaphores.  A producer waits
+  for a free slot, so every frame passes through every Region in order and
+  the results are deterministic (the same as running the Regions in turn).
+latest-wins: a triple buffer.  A producer never waits, it replaces any frame
+  the consumer has not yet started, so a slow Region skips to the newest
+  frame rather than falling behind (suited to live camera input).
+
+The Regions are handed to the workers as checkpoint files (see Checkpoint),
+which also lets each worker save its trained Region when the run ends.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import numpy
+import multiprocessing
+from HTM import Checkpoint
+
+WAIT_TIMEOUT = 1.0 #seconds between checks that the workers are still alive
+
+class SharedRing(object):
+  """
+  A single producer, single consumer queue of sparse frames (arrays of
+  active bit indices) held in shared memory.
+  """
+
+  def __init__(self, capacity, numSlots=4, lockstep=True):
+    """
+    @param capacity: the maximum number of indices in one frame (the size of
+    the dense bit matrix the indices refer to).
+    @param numSlots: the number of frames the ring can hold in lockstep mode
+    (latest-wins mode always uses 3).
+    @param lockstep: true for lockstep mode, false for latest-wins mode.
+    """
+    self.capacity = capacity
+    self.lockstep = lockstep
+    self.numSlots = numSlots if lockstep else 3
+    self.data = multiprocessing.RawArray('i', self.numSlots*capacity)
+    #frame sequence number and index count of each slot
+    self.header = multiprocessing.RawArray('i', 2*self.numSlots)
+    if lockstep:
+      self.free = multiprocessing.Semaphore(self.numSlots)
+      self.filled = multiprocessing.Semaphore(0)
+    else:
+      #triple buffer: the producer and consumer each own a slot, and the third
+      #holds the latest frame; state is [latest slot, latest is unread, ended]
+      self.lock = multiprocessing.Lock()
+      self.filled = multiprocessing.Semaphore(0)
+      self.state = multiprocessing.RawArray('i', [1, 0, 0])
+    self.putSlot = 0 #slot the producer writes next (owned by the producer)
+    self.getSlot = 0 if lockstep else 2 #slot the consumer reads (owned by consumer)
+    self.reading = False #true while the consumer holds a lockstep slot
+    self.views = None
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    state['views'] = None #numpy views are recreated within each process
+    return state
+
+  def __getViews(self):
+    """ Return numpy views of the (slots x capacity) data and the header. """
+    if self.views is None:
+      data = numpy.frombuffer(self.data, dtype=numpy.int32)
+      header = numpy.frombuffer(self.header, dtype=numpy.int32)
+      self.views = (data.reshape(self.numSlots, self.capacity), \
+                    header.reshape(self.numSlots, 2))
+    return self.views
+
+  def put(self, seq, indices):
+    """
+    Add a frame to the ring.  In lockstep mode wait until a slot is free, in
+    latest-wins mode replace the latest frame if it has not yet been read.
+    The end of input marker never replaces a frame, it is taken once the
+    latest frame has been read.
+    @param seq: the frame sequence number (negative marks the end of input).
+    @param indices: array of the frame's active bit indices.
+    """
+    data, header = self.__getViews()
+    if not self.lockstep and seq < 0:
+      self.lock.acquire()
+      self.state[2] = 1
+      self.lock.release()
+      self.filled.release()
+      return
+    if self.lockstep:
+      self.free.acquire()
+    slot = self.putSlot
+    n = len(indices)
+    data[slot,:n] = indices
+    header[slot] = (seq, n)
+    if self.lockstep:
+      self.putSlot = (slot+1) % self.numSlots
+    else:
+      self.lock.acquire()
+      self.putSlot = self.state[0]
+      self.state[0] = slot
+      self.state[1] = 1
+      self.lock.release()
+    self.filled.release()
+
+  def get(self, timeout=None):
+    """
+    Take the next frame from the ring (the newest frame in latest-wins mode),
+    waiting for one to arrive.  The returned indices are a view of the shared
+    slot that remains valid until the next call to get.
+    @param timeout: max seconds to wait, or None to wait indefinitely.
+    @return a tuple of the frame's sequence number and indices, or None if
+    the timeout passed first.
+    """
+    data, header = self.__getViews()
+    if self.lockstep:
+      if self.reading: #the previous frame has now been consumed
+        self.free.release()
+        self.getSlot = (self.getSlot+1) % self.numSlots
+        self.reading = False
+      if not self.filled.acquire(True, timeout):
+        return None
+      self.reading = True
+      slot = self.getSlot
+    else:
+      while True:
+        if not self.filled.acquire(True, timeout):
+          return None
+        self.lock.acquire()
+        hasFrame = self.state[1]==1
+        ended = self.state[2]==1
+        if hasFrame:
+          self.getSlot, self.state[0] = self.state[0], self.getSlot
+          self.state[1] = 0
+        self.lock.release()
+        if hasFrame:
+          break
+        if ended:
+          return -1, data[0,:0]
+        #else an earlier get already took this frame
+      slot = self.getSlot
+    seq, n = header[slot]
+    return seq, data[slot,:n]
+
+
+def _runWorker(path, frozen, inRing, outRing, savePath):
+  """
+  Worker process: run the Region saved at path on every frame taken from
+  inRing, passing its sparse output to outRing, until the end of input.
+  """
+  if frozen:
+    region = Checkpoint.loadFrozenRegion(path)
+  else:
+    region = Checkpoint.loadRegion(path)
+  while True:
+    seq, indices = inRing.get()
+    if seq < 0:
+      outRing.put(seq, ())
+      break
+    region.updateInput(indices)
+    region.runOnce()
+    outRing.put(seq, region.getSparseOutput())
+  if savePath and not frozen:
+    Checkpoint.saveRegion(region, savePath)
+
+
+class PipelineExecutor(object):
+  """
+  Run a hierarchy of Regions as a pipeline of worker processes.
+  """
+
+  def __init__(self, regions, lockstep=True, frozen=False, numSlots=4):
+    """
+    @param regions: list of Regions or Region checkpoint file paths from the
+    bottom of the hierarchy up, each taking the output of the previous one.
+    Their learning states are used as saved.
+    @param lockstep: true to pass every frame through every Region in order
+    (deterministic), false for latest-wins (slow Regions skip frames).
+    @param frozen: true to run inference-only FrozenRegions (see
+    Checkpoint.loadFrozenRegion), which share the checkpoint memory maps.
+    @param numSlots: number of frames each lockstep ring can hold.
+    """
+    self.lockstep = lockstep
+    self.frozen = frozen
+    self.numSlots = numSlots
+    self.tempDir = None
+    self.paths = []
+    for i, region in enumerate(regions):
+      if isinstance(region, basestring):
+        self.paths.append(region)
+      else:
+        if self.tempDir is None:
+          self.tempDir = tempfile.mkdtemp(prefix='htmpipe')
+        path = os.path.join(self.tempDir, 'region%d.htm' % (i+1))
+        Checkpoint.saveRegion(region, path)
+        self.paths.append(path)
+
+    #ring i feeds Region i, the last ring holds the output of the hierarchy
+    header, arrays = Checkpoint.readCheckpoint(self.paths[0])
+    inputSize = header['params']['inputSize']
+    capacities = [inputSize[0]*inputSize[1]]
+    for path in self.paths:
+      header, arrays = Checkpoint.readCheckpoint(path)
+      outShape = header['frozen']['outShape']
+      capacities.append(outShape[0]*outShape[1])
+    self.capacities = capacities
+    self.outShape = tuple(outShape)
+    self.feedError = None #exc_info of an exception raised by the frames iterator
+
+  def run(self, frames, savePaths=None):
+    """
+    Run the hierarchy over the frames, lazily yielding the output of the top
+    Region for each frame as it emerges from the pipeline (in latest-wins mode
+    some frames are skipped).
+    @param frames: iterator of 2d input bit matrices (or arrays of the flat
+    indices of the active input bits) for Region 1.
+    @param savePaths: optional list of checkpoint file paths to save each
+    trained Region to once all frames have been run.
+    @return generator of tuples of the frame number (counting from 0) and
+    the sparse output of the top Region (see Region.getSparseOutput).
+    """
+    rings = [SharedRing(c, self.numSlots, self.lockstep) for c in self.capacities]
+    savePaths = savePaths or [None]*len(self.paths)
+    workers = []
+    for i, path in enumerate(self.paths):
+      worker = multiprocessing.Process(target=_runWorker, args=(path, self.frozen, \
+                                       rings[i], rings[i+1], savePaths[i]))
+      worker.daemon = True
+      worker.start()
+      workers.append(worker)
+
+    #feed the frames from a thread so the pipeline can drain as it fills
+    self.feedError = None
+    feeder = threading.Thread(target=self.__feed, args=(frames, rings[0]))
+    feeder.daemon = True
+    feeder.start()
+
+    finished = False
+    try:
+      outRing = rings[-1]
+      while True:
+        result = outRing.get(WAIT_TIMEOUT)
+        if result is None:
+          if not feeder.is_alive():
+            self.__raiseFeedError()
+          if not all(worker.is_alive() for worker in workers):
+            raise RuntimeError("a pipeline worker process exited unexpectedly")
+          continue
+        seq, indices = result
+        if seq < 0:
+          finished = True
+          break
+        yield seq, indices.copy()
+      self.__raiseFeedError()
+    finally:
+      #let the workers finish saving, else stop them (the run was abandoned)
+      for worker in workers:
+        if finished:
+          worker.join()
+        else:
+          worker.terminate()
+      feeder.join(WAIT_TIMEOUT)
+
+  def __feed(self, frames, ring):
+    """
+    Put the sparse frames into the input ring followed by the end marker.
+    The end marker is sent even if the frames iterator raises, so the workers
+    still finish, and the exception is kept for run to raise.
+    """
+    try:
+      seq = 0
+      for frame in frames:
+        if numpy.ndim(frame)!=1:
+          frame = numpy.flatnonzero(frame)
+        ring.put(seq, frame)
+        seq += 1
+    except Exception:
+      self.feedError = sys.exc_info()
+    finally:
+      ring.put(-1, ())
+  
+  def __raiseFeedError(self):
+    """ Raise the exception from the frames iterator, if it raised one. """
+    if self.feedError:
+      excType, excValue, excTraceback = self.feedError
+      self.feedError = None
+      raise excType, excValue, excTraceback
+
+  def close(self):
+    """ Remove the temporary checkpoints of the Regions given as objects. """
+    if self.tempDir:
+      shutil.rmtree(self.tempDir, True)
+      self.tempDir = None
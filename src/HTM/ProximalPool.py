@@ -0,0 +1,328 @@
+"""
+Created on Oct 16, 2026
+
+Array-backed storage for the proximal (spatial pooling) synapses of every
+Column in a Region.
+
+Instead of one Synapse object plus one InputCell object per proximal synapse,
+the pool keeps each Column's input bit indices and permanences as rows of
+contiguous numpy arrays.  Row c of every array belongs to Region.columns[c],
+and the overlap of all Columns can then be computed with a single gather and
+sum over the current input matrix.
+
+Columns of a Region in this storage mode still have a proximalSegment, but it
+is a PoolSegment whose synapses are lightweight views created on request
+that read and write the pool arrays.  Existing code (such as the region
+visualizer) that walks the synapses continues to work unchanged.
+
+The pool supports more than one strategy to count the active connected
+synapses of every Column (see ProximalPool.overlapMode):
+
+OVERLAP_DENSE: gather the input bit of every synapse and sum per Column.
+  The cost is proportional to the total number of proximal synapses.
+OVERLAP_SPARSE: walk a reverse index from each active input bit to the
+  synapses attached to it.  The cost is proportional to the number of active
+  input bits, which suits mostly-black inputs such as motion masks.
+OVERLAP_INCREMENTAL: diff the input against the previous time step's input
+  and only adjust the counts of Columns with synapses on bits that flipped.
+  The counts are fully recomputed whenever a synapse crosses the connected
+  permanence threshold, so this is cheapest for near-static scenes.
+"""
+
+import numpy
+from HTM.Segment import Segment
+from HTM.Synapse import Synapse
+
+OVERLAP_DENSE = 'dense'   #gather every synapse's input bit
+OVERLAP_SPARSE = 'sparse' #accumulate only from the active input bits
+OVERLAP_INCREMENTAL = 'incremental' #adjust last counts by flipped input bits
+
+class ProximalPool(object):
+  """
+  Hold the proximal synapses of all Columns in a Region as numpy arrays.
+  """
+  
+  def __init__(self, region, synapsesPerSegment):
+    """
+    Allocate the (empty) pool for the given region.  The synapses themselves
+    are filled in by the Region with setSynapse() during initialization.
+    @param region: the parent Region whose Columns own the synapses.
+    @param synapsesPerSegment: number of proximal synapses for every Column.
+    """
+    self.region = region
+    self.synapsesPerSegment = synapsesPerSegment
+    shape = (len(region.columns), synapsesPerSegment)
+    #flat index (x*inputHeight + y) of the input bit each synapse is attached to
+    self.inputIndex = numpy.zeros(shape, dtype=numpy.int32)
+    self.permanence = numpy.zeros(shape)
+    #distance from each synapse's input bit to its Column's center in terms
+    #of the column grid (used for the average receptive field size)
+    self.distance = numpy.zeros(shape)
+    
+    self.overlapMode = OVERLAP_DENSE
+    #reverse index from input bit to synapses, built when first needed
+    self.bitSynapses = None
+    self.bitStarts = None
+    
+    #state kept between time steps for incremental overlap updates
+    self.prevInput = None
+    self.prevCounts = None
+    self.connectedPerm = None
+    #set whenever a synapse's permanence crosses Synapse.CONNECTED_PERM
+    self.connectionsChanged = True
+  
+  def setSynapse(self, col, i, ix, iy, permanence):
+    """
+    Assign the i'th proximal synapse of the col'th Column.
+    @param col: index of the Column in Region.columns.
+    @param i: index of the synapse within the Column's proximal segment.
+    @param ix: x position of the input bit the synapse is attached to.
+    @param iy: y position of the input bit the synapse is attached to.
+    @param permanence: the synapse's initial permanence value (0.0-1.0).
+    """
+    region = self.region
+    column = region.columns[col]
+    self.inputIndex[col,i] = ix*region.inputHeight + iy
+    self.permanence[col,i] = min(1.0, permanence) #clamp permanence to 1.0
+    d = ((column.ix-ix)**2 + (column.iy-iy)**2)**0.5
+    self.distance[col,i] = d / region.xSpace
+  
+  def setSynapses(self, inputIndex, permanence):
+    """
+    Assign the proximal synapses of all Columns at once.
+    @param inputIndex: (columns x synapsesPerSegment) array of the flat input bit
+    indices (x*inputHeight + y) the synapses are attached to.
+    @param permanence: array of the synapses' initial permanence values.
+    """
+    region = self.region
+    self.inputIndex[:] = inputIndex
+    numpy.minimum(permanence, 1.0, self.permanence) #clamp permanence to 1.0
+    ix = self.inputIndex // region.inputHeight
+    iy = self.inputIndex % region.inputHeight
+    colX = numpy.array([col.ix for col in region.columns])[:,None]
+    colY = numpy.array([col.iy for col in region.columns])[:,None]
+    self.distance[:] = numpy.sqrt((colX-ix)**2 + (colY-iy)**2) / region.xSpace
+    self.bitSynapses = None
+    self.connectionsChanged = True
+  
+  def getConnected(self):
+    """ Return a boolean array marking which synapses are currently connected. """
+    return self.permanence >= Synapse.CONNECTED_PERM
+  
+  def getActiveCounts(self, inputData, activeBits=None):
+    """
+    Return an array with the number of connected synapses attached to active
+    input bits for every Column (in the order of Region.columns).  The counts
+    are computed using the strategy selected by overlapMode, except that when
+    the active input bits are already known they are counted sparsely (unless
+    in incremental mode).
+    @param inputData: the 2d input bit matrix of the Region.
+    @param activeBits: optional array of flat indices of the active input bits.
+    """
+    if activeBits is not None and self.overlapMode!=OVERLAP_INCREMENTAL:
+      return self.getActiveCountsFromBits(activeBits)
+    if self.overlapMode==OVERLAP_SPARSE:
+      return self.getActiveCountsFromBits(numpy.flatnonzero(inputData))
+    if self.overlapMode==OVERLAP_INCREMENTAL:
+      return self.getActiveCountsFromDelta(inputData)
+    
+    active = inputData.ravel().take(self.inputIndex) != 0
+    active &= self.getConnected()
+    return active.sum(axis=1)
+  
+  def getActiveCountsFromDelta(self, inputData):
+    """
+    Return the number of connected synapses attached to active input bits for
+    every Column by adjusting the counts from the previous call for only those
+    input bits that changed since then.  If any synapse has become connected
+    or disconnected since the previous call, all counts are recomputed.
+    @param inputData: the 2d input bit matrix of the Region.
+    """
+    newInput = inputData.ravel() != 0
+    if self.prevCounts is None or self.connectionsChanged or \
+       self.connectedPerm!=Synapse.CONNECTED_PERM:
+      active = newInput.take(self.inputIndex)
+      active &= self.getConnected()
+      self.prevCounts = active.sum(axis=1)
+      self.prevInput = newInput
+      self.connectedPerm = Synapse.CONNECTED_PERM
+      self.connectionsChanged = False
+      return self.prevCounts.copy()
+    
+    flipped = numpy.flatnonzero(newInput != self.prevInput)
+    if len(flipped) > 0:
+      synapses = self.getBitSynapses(flipped)
+      connected = self.permanence.ravel().take(synapses) >= Synapse.CONNECTED_PERM
+      synapses = synapses[connected]
+      #+1 for synapses whose bit turned on, -1 for those whose bit turned off
+      delta = numpy.where(newInput.take(self.inputIndex.ravel().take(synapses)), 1, -1)
+      cols = synapses // self.synapsesPerSegment
+      self.prevCounts += numpy.bincount(cols, delta, len(self.prevCounts)).astype(self.prevCounts.dtype)
+      self.prevInput = newInput
+    return self.prevCounts.copy()
+  
+  def getActiveCountsFromBits(self, activeBits):
+    """
+    Return the number of connected synapses attached to active input bits for
+    every Column by only visiting the synapses of the given active input bits.
+    @param activeBits: array of flat indices (x*inputHeight + y) of all the
+    currently active input bits.
+    """
+    synapses = self.getBitSynapses(activeBits)
+    connected = self.permanence.ravel().take(synapses) >= Synapse.CONNECTED_PERM
+    cols = synapses[connected] // self.synapsesPerSegment
+    return numpy.bincount(cols, minlength=len(self.permanence))
+  
+  def getBitSynapses(self, bits):
+    """
+    Return the flat indices (col*synapsesPerSegment + i) of all the synapses
+    attached to any of the given input bits, using the reverse bit index.
+    @param bits: array of flat indices (x*inputHeight + y) of input bits.
+    """
+    if self.bitSynapses is None:
+      self.buildBitIndex()
+    
+    bits = numpy.asarray(bits, dtype=numpy.int32)
+    starts = self.bitStarts[bits]
+    lengths = self.bitStarts[bits+1] - starts
+    #concatenate the index ranges [start, start+length) of all the bits
+    total = lengths.sum()
+    offsets = numpy.repeat(starts - (numpy.cumsum(lengths)-lengths), lengths)
+    return self.bitSynapses[offsets + numpy.arange(total)]
+  
+  def buildBitIndex(self):
+    """
+    Build the reverse index from every input bit to the synapses attached to
+    it.  The synapses of input bit b are bitSynapses[bitStarts[b]:bitStarts[b+1]].
+    """
+    region = self.region
+    flatInputs = self.inputIndex.ravel()
+    self.bitSynapses = numpy.argsort(flatInputs, kind='mergesort').astype(numpy.int32)
+    numBits = region.inputWidth * region.inputHeight
+    self.bitStarts = numpy.searchsorted(flatInputs[self.bitSynapses], \
+                                        numpy.arange(numBits+1)).astype(numpy.int32)
+  
+  def updatePermanences(self, inputData, activeCols, boostedCols, boostAmount):
+    """
+    Perform the spatial pooling permanence learning for all Columns at once
+    (see adaptPermanences).  The Region's running receptive field sums are
+    adjusted for the synapses that crossed the connected permanence threshold.
+    @param inputData: the 2d input bit matrix of the Region.
+    @param activeCols: boolean array of the winning Columns after inhibition.
+    @param boostedCols: boolean array of the Columns to boost permanences for.
+    @param boostAmount: permanence increase for synapses of boosted Columns.
+    """
+    change = adaptPermanences(self.permanence, self.inputIndex, self.distance, \
+                              inputData.ravel(), activeCols, boostedCols, boostAmount)
+    if change is not None:
+      self.connectionsChanged = True
+      self.region.updateReceptiveField(*change)
+  
+  def getConnectedDistanceSum(self):
+    """
+    Return the sum of the distances (in column grid space) of all currently
+    connected synapses from their Column's center, and the number of them.
+    """
+    connected = self.getConnected()
+    return self.distance[connected].sum(), connected.sum()
+
+
+def adaptPermanences(permanence, inputIndex, distance, inputBits, activeCols, 
+                     boostedCols, boostAmount):
+  """
+  Perform the spatial pooling permanence learning for a block of Columns.
+  For the winning (active) Columns, synapses that are active (connected to
+  an active input bit) have their permanence increased and all others are
+  decreased (see Column.updatePermanences).  All synapses of the boosted
+  Columns additionally have their permanence increased by boostAmount (see
+  Column.increasePermanences).  Permanences are clipped to 0.0-1.0 once
+  after all changes are applied.
+  @param permanence: (columns x synapses) permanence array, updated in place.
+  @param inputIndex: the flat input bit index of every synapse.
+  @param distance: the distance of every synapse from its Column's center.
+  @param inputBits: the flattened input bit matrix of the Region.
+  @param activeCols: boolean array of the winning Columns after inhibition.
+  @param boostedCols: boolean array of the Columns to boost permanences for.
+  @param boostAmount: permanence increase for synapses of boosted Columns.
+  @return a tuple of the change in the summed distance and in the number of
+  the connected synapses, or None if no synapse crossed the connected 
+  permanence threshold.
+  """
+  cols = activeCols | boostedCols
+  if not cols.any():
+    return None
+  perms = permanence[cols]
+  wasConnected = perms >= Synapse.CONNECTED_PERM
+  
+  delta = numpy.zeros(perms.shape)
+  learning = activeCols[cols]
+  active = inputBits.take(inputIndex[cols][learning]) != 0
+  active &= wasConnected[learning]
+  delta[learning] = numpy.where(active, Synapse.PERMANENCE_INC, -Synapse.PERMANENCE_DEC)
+  delta[boostedCols[cols]] += boostAmount
+  
+  perms += delta
+  numpy.clip(perms, 0.0, 1.0, perms)
+  permanence[cols] = perms
+  
+  isConnected = perms >= Synapse.CONNECTED_PERM
+  changed = wasConnected != isConnected
+  if not changed.any():
+    return None
+  distance = distance[cols]
+  connected = changed & isConnected
+  disconnected = changed & wasConnected
+  return distance[connected].sum() - distance[disconnected].sum(), \
+         connected.sum() - disconnected.sum()
+
+
+class PoolSynapse(Synapse):
+  """
+  A proximal Synapse view whose permanence lives in a ProximalPool.
+  """
+  
+  __slots__ = ('pool', 'col', 'i')
+  
+  def __init__(self, pool, col, i):
+    self.pool = pool
+    self.col = col
+    self.i = i
+    region = pool.region
+    ix, iy = divmod(int(pool.inputIndex[col,i]), region.inputHeight)
+    self.inputSource = region.getInputCell(ix, iy)
+  
+  def getPermanence(self):
+    return self.pool.permanence[self.col, self.i]
+  
+  def setPermanence(self, permanence):
+    pool = self.pool
+    wasConnected = pool.permanence[self.col, self.i] >= Synapse.CONNECTED_PERM
+    pool.permanence[self.col, self.i] = permanence
+    if wasConnected != (permanence >= Synapse.CONNECTED_PERM):
+      pool.connectionsChanged = True
+  
+  permanence = property(getPermanence, setPermanence)
+
+
+class PoolSegment(Segment):
+  """
+  The proximal Segment of a single Column stored within a ProximalPool.
+  The synapses of the segment are PoolSynapse views that are created each
+  time they are requested.
+  """
+  
+  __slots__ = ('pool', 'col')
+  
+  def __init__(self, pool, col):
+    self.pool = pool
+    self.col = col
+    self.isSequence = False
+    self.segActiveThreshold = pool.region.segActiveThreshold
+    self.activity = None
+    self.cell = None
+    self.lastActiveStep = 0
+  
+  @property
+  def synapses(self):
+    return [PoolSynapse(self.pool, self.col, i) \
+            for i in xrange(self.pool.synapsesPerSegment)]
@@ -53,9 +53,17 @@ import numpy
 from math import exp, sqrt, ceil
 from HTM.Column import Column
 from HTM.Synapse import Synapse
+from HTM.ProximalPool import ProximalPool, PoolSegment
+from HTM.DistalPool import DistalPool
+from HTM.Segment import SegmentActivity
+from HTM.Inhibition import Inhibition, neighborhoodMax
+from HTM.FrozenRegion import FrozenRegion
+from HTM.ShardedPooling import ShardedSpatialPooler
+from HTM.Column import EMA_ALPHA
 
 RAD_BIAS_PEAK = 0.8 #input-bit radius bias peak for default proximal perms
 RAD_BIAS_STD_DEV = 0.25 #input-bit radius standard deviation bias
+MAX_INIT_CHUNK_SIZE = 1<<22 #max number of candidate input positions sampled at once
 DEBUG = True
 
 class Region(object):
@@ -65,7 +73,9 @@ class Region(object):
   
   def __init__(self, inputSize, colGridSize, pctInputPerCol=0.05, pctMinOverlap=0.1, 
                localityRadius=0, pctLocalActivity=0.02, cellsPerCol=1, 
-               segActiveThreshold=3, newSynapseCount=5):
+               segActiveThreshold=3, newSynapseCount=5, useArrays=False,
+               maxSegmentsPerCell=0, maxSynapsesPerSegment=0, 
+               maxUpdateAge=0, maxUpdatesPerCell=0, fastInit=False):
     """
     Initialization (from Numenta docs):
     Prior to receiving any inputs, the region is initialized by computing a list of initial 
@@ -100,15 +110,43 @@ class Region(object):
     @param segActiveThreshold: Number of active synapses to activate a segment.
     @param newSynapseCount: number of new distal synapses added if none activated during 
     learning.
+    @param useArrays: if True, store the proximal synapses of all Columns in a
+    ProximalPool and the distal segments and synapses of all Cells in a 
+    DistalPool of numpy arrays rather than as individual Synapse objects.
+    @param maxSegmentsPerCell: maximum number of distal segments per cell, the 
+    least recently active segment is removed to make room (0 means no limit).
+    @param maxSynapsesPerSegment: maximum number of synapses per distal segment,
+    the lowest permanence synapses are removed to make room (0 means no limit).
+    If either limit is set, distal synapses whose permanence decays to 0.0 are
+    also removed (along with segments left without any synapses).
+    @param maxUpdateAge: number of time steps a queued segment update may wait 
+    for its cell to learn (or stop predicting) before it expires (0 means never).
+    @param maxUpdatesPerCell: maximum number of queued segment updates per cell,
+    the oldest updates expire to make room (0 means no limit).
+    @param fastInit: if True, choose the proximal synapses, initial permanences
+    and locality biases of all Columns at once with numpy from the Region's 
+    seeded generator (the connections differ from the default construction).
     """
     self.inputWidth = inputSize[0]#len(inputData)
     self.inputHeight = inputSize[1]#len(inputData[0])
     self.inputData = numpy.zeros(inputSize, dtype=numpy.uint8)
+    #flat indices of the active input bits if the input was given sparse
+    self.inputBits = None
     
     self.localityRadius = localityRadius
     self.cellsPerCol = cellsPerCol
     self.segActiveThreshold = segActiveThreshold
     self.newSynapseCount = newSynapseCount
+    self.maxSegmentsPerCell = maxSegmentsPerCell
+    self.maxSynapsesPerSegment = maxSynapsesPerSegment
+    self.boundedGrowth = maxSegmentsPerCell > 0 or maxSynapsesPerSegment > 0
+    self.prunedSegments = 0 #total distal segments removed by the growth limits
+    self.prunedSynapses = 0 #total distal synapses removed by the growth limits
+    self.maxUpdateAge = maxUpdateAge
+    self.maxUpdatesPerCell = maxUpdatesPerCell
+    self.queuedUpdates = 0 #current number of queued segment updates (all cells)
+    self.expiredUpdates = 0 #total segment updates discarded without being applied
+    self.timeStep = 0
     
     self.pctInputPerCol = pctInputPerCol
     self.pctMinOverlap = pctMinOverlap
@@ -116,6 +154,7 @@ class Region(object):
     
     self.spatialLearning = False
     self.temporalLearning = False
+    self.useArrays = useArrays
     
     #Reduce the number of columns and map centers of input x,y correctly.
     #column grid will be relative to size of input grid in both dimensions
@@ -124,6 +163,27 @@ class Region(object):
     self.xSpace = (self.inputWidth-1*1.0) / (self.width-1)
     self.ySpace = (self.inputHeight-1*1.0) / (self.height-1)
     
+    #Column overlaps, active states, duty cycles and boosts are kept as 2d 
+    #column grid arrays so inhibition and boosting can be performed on the
+    #entire grid at once
+    gridShape = (self.width, self.height)
+    self.overlapGrid = numpy.zeros(gridShape)
+    self.activeGrid = numpy.zeros(gridShape, dtype=numpy.bool_)
+    self.boostGrid = numpy.ones(gridShape)
+    self.activeDutyGrid = numpy.ones(gridShape)
+    self.overlapDutyGrid = numpy.ones(gridShape)
+    self.inhibition = Inhibition(self.width, self.height)
+    
+    #Cell active, predicting, and learning states at time t and t-1 are kept
+    #as (column x cell) arrays, row i belongs to the cells of columns[i]
+    cellShape = (self.width*self.height, self.cellsPerCol)
+    self.cellActive = numpy.zeros(cellShape, dtype=numpy.bool_)
+    self.cellPredicting = numpy.zeros(cellShape, dtype=numpy.bool_)
+    self.cellLearning = numpy.zeros(cellShape, dtype=numpy.bool_)
+    self.cellWasActive = numpy.zeros(cellShape, dtype=numpy.bool_)
+    self.cellWasPredicted = numpy.zeros(cellShape, dtype=numpy.bool_)
+    self.cellWasLearning = numpy.zeros(cellShape, dtype=numpy.bool_)
+    
     #Create the columns based on the size of the input data to connect to.
     self.columns = []
     self.columnGrid = []
@@ -136,6 +196,16 @@ class Region(object):
         self.columns.append(col)
       self.columnGrid.append(yCols)
     
+    #InputCells shared by all proximal synapses, created as they are first needed
+    self.inputCells = {}
+    
+    #all cells of the region in the order of the rows of the cell state arrays
+    self.cells = [cell for col in self.columns for cell in col.cells]
+    
+    #flat indices of the cells that were learning at t-1, cached per time step
+    #and keyed by the column index they were gathered around (None for all)
+    self.learningCellIndex = {}
+    
     #size the output array as double grid for 4-cell, else just pad the first
     #array dimension for 2 or 3 cell (and same size if just 1-cell)
     if cellsPerCol==4:
@@ -143,6 +213,21 @@ class Region(object):
     else:
       outShape = (len(self.columnGrid)*cellsPerCol, len(self.columnGrid[0]))
     self.outData = numpy.zeros(outShape, dtype=numpy.uint8)
+    #view of outData indexed by [cx, cy, cell] (for 4 cells [cx, cy, i/2, i%2])
+    #so all the cell states can be written to the output at once
+    w, h = self.width, self.height
+    if cellsPerCol < 4:
+      self.outView = self.outData.reshape(w, cellsPerCol, h).transpose(0, 2, 1)
+    else:
+      self.outView = self.outData.reshape(w, 2, h, 2).transpose(0, 2, 3, 1)
+    #flat outData index of every cell, in the order of the cell state arrays
+    outIndex = numpy.arange(self.outData.size, dtype=numpy.int32)
+    outIndex = outIndex.reshape(outShape)
+    if cellsPerCol < 4:
+      outIndex = outIndex.reshape(w, cellsPerCol, h).transpose(0, 2, 1)
+    else:
+      outIndex = outIndex.reshape(w, 2, h, 2).transpose(0, 2, 3, 1)
+    self.outIndex = outIndex.ravel()
     
     #segmentUpdateList A list of segmentUpdate structures. segmentUpdateList(c,i)
     #   is the list of changes for cell i in column c.
@@ -162,34 +247,59 @@ class Region(object):
     #  considered during the inhibition step.
     self.minOverlap = synapsesPerSegment * pctMinOverlap
     
+    self.proximalPool = None
+    self.distalPool = None
+    self.sharding = None #ShardedSpatialPooler while sharded (see startSharding)
+    if self.useArrays:
+      self.proximalPool = ProximalPool(self, synapsesPerSegment)
+      self.distalPool = DistalPool(self)
+    
+    #Per time step cache of the distal segment synapse activity (in arrays
+    #mode the distal pool's segment counts serve as the cache)
+    self.segmentActivity = self.distalPool or SegmentActivity(self)
+    
     longerSide = max(self.inputWidth, self.inputHeight)
     random.seed(42) #same connections each time for easier debugging
+    self.rng = numpy.random.RandomState(42) #vectorized init and learning sampling
     
     inputRadius = int(round(inputRadius))
-    minY = 0
-    maxY = self.inputHeight-1
-    minX = 0
-    maxX = self.inputWidth-1
-    for col in self.columns:
-      #restrict synapse connections if localityRadius is non-zero
-      if self.localityRadius > 0:
-        minY = max(0, col.iy-inputRadius)
-        maxY = min(self.inputHeight-1, col.iy+inputRadius)
-        minX = max(0, col.ix-inputRadius)
-        maxX = min(self.inputWidth-1, col.ix+inputRadius)
-      #ensure we sample unique input positions to connect synapses to
-      allPos = []
-      for y in xrange(minY,maxY+1):
-        for x in xrange(minX,maxX+1):
-          allPos.append((x,y))
-      for rx,ry in random.sample(allPos, synapsesPerSegment):
-        inputCell = InputCell(rx, ry, self.inputData)
-        permanence = random.gauss(Synapse.CONNECTED_PERM, Synapse.PERMANENCE_INC)
-        permanence = max(0.0, permanence) #ensure minimum of zero to clamp edge cases
-        distance = sqrt((col.ix-rx)**2 + (col.iy-ry)**2)
-        localityBias = (RAD_BIAS_PEAK/0.4)*exp((distance/(longerSide*RAD_BIAS_STD_DEV))**2/-2)
-        syn = Synapse(inputCell, permanence*localityBias)
-        col.proximalSegment.addSynapse(syn)
+    if fastInit:
+      self.__initProximalSynapses(synapsesPerSegment, inputRadius, longerSide)
+    else:
+      minY = 0
+      maxY = self.inputHeight-1
+      minX = 0
+      maxX = self.inputWidth-1
+      for ci, col in enumerate(self.columns):
+        #restrict synapse connections if localityRadius is non-zero
+        if self.localityRadius > 0:
+          minY = max(0, col.iy-inputRadius)
+          maxY = min(self.inputHeight-1, col.iy+inputRadius)
+          minX = max(0, col.ix-inputRadius)
+          maxX = min(self.inputWidth-1, col.ix+inputRadius)
+        #ensure we sample unique input positions to connect synapses to
+        allPos = []
+        for y in xrange(minY,maxY+1):
+          for x in xrange(minX,maxX+1):
+            allPos.append((x,y))
+        for i, (rx,ry) in enumerate(random.sample(allPos, synapsesPerSegment)):
+          permanence = random.gauss(Synapse.CONNECTED_PERM, Synapse.PERMANENCE_INC)
+          permanence = max(0.0, permanence) #ensure minimum of zero to clamp edge cases
+          distance = sqrt((col.ix-rx)**2 + (col.iy-ry)**2)
+          localityBias = (RAD_BIAS_PEAK/0.4)*exp((distance/(longerSide*RAD_BIAS_STD_DEV))**2/-2)
+          if self.proximalPool:
+            self.proximalPool.setSynapse(ci, i, rx, ry, permanence*localityBias)
+          else:
+            syn = Synapse(self.getInputCell(rx, ry), permanence*localityBias)
+            col.proximalSegment.addSynapse(syn)
+        if self.proximalPool:
+          col.proximalSegment = PoolSegment(self.proximalPool, ci)
+    
+    #Running sums of the distances of all connected proximal synapses, kept
+    #up to date as synapses become connected or disconnected during learning
+    self.receptiveFieldSum = 0.0
+    self.receptiveFieldCount = 0
+    self.receptiveFieldPerm = None #CONNECTED_PERM the sums were computed with
     
 #    if self.localityRadius>0:
 #      self.inhibitionRadius = self.localityRadius
@@ -215,6 +325,119 @@ class Region(object):
       print "conPerm,permInc = ", Synapse.CONNECTED_PERM, Synapse.PERMANENCE_INC
       print "outputGrid = ",self.outData.shape
   
+  def __initProximalSynapses(self, synapsesPerSegment, inputRadius, longerSide):
+    """
+    Connect the proximal synapses of all Columns using vectorized sampling.
+    The distinct input positions of every Column are chosen at once from its
+    locality window (or from the whole input if localityRadius is 0).  The
+    permanences and locality biases are then computed as in the default
+    construction for all synapses at once.
+    """
+    w, h = self.inputWidth, self.inputHeight
+    numCols = len(self.columns)
+    colX = numpy.array([col.ix for col in self.columns])
+    colY = numpy.array([col.iy for col in self.columns])
+    
+    if self.localityRadius > 0:
+      offsets = numpy.arange(-inputRadius, inputRadius+1)
+      xs = colX[:,None] + offsets
+      ys = colY[:,None] + offsets
+      valid = ((xs >= 0) & (xs < w))[:,:,None] & ((ys >= 0) & (ys < h))[:,None,:]
+      candidates = (xs[:,:,None]*h + ys[:,None,:]).reshape(numCols, -1)
+      valid = valid.reshape(numCols, -1)
+      if valid.sum(axis=1).min() < synapsesPerSegment:
+        raise ValueError("sample larger than population")
+      inputIndex = self.__sampleCandidates(numCols, candidates, valid, synapsesPerSegment)
+    else:
+      if w*h < synapsesPerSegment:
+        raise ValueError("sample larger than population")
+      inputIndex = self.__sampleDistinct(numCols, w*h, synapsesPerSegment)
+    
+    rx = inputIndex // h
+    ry = inputIndex % h
+    permanence = self.rng.normal(Synapse.CONNECTED_PERM, Synapse.PERMANENCE_INC, \
+                                 inputIndex.shape)
+    permanence = numpy.maximum(0.0, permanence) #clamp edge cases at zero
+    distance = numpy.sqrt((colX[:,None]-rx)**2 + (colY[:,None]-ry)**2)
+    localityBias = (RAD_BIAS_PEAK/0.4)*numpy.exp((distance/(longerSide*RAD_BIAS_STD_DEV))**2/-2)
+    permanence *= localityBias
+    
+    if self.proximalPool:
+      self.proximalPool.setSynapses(inputIndex, permanence)
+      for ci, col in enumerate(self.columns):
+        col.proximalSegment = PoolSegment(self.proximalPool, ci)
+    else:
+      rx = rx.tolist()
+      ry = ry.tolist()
+      permanence = permanence.tolist()
+      for ci, col in enumerate(self.columns):
+        segment = col.proximalSegment
+        for x, y, perm in zip(rx[ci], ry[ci], permanence[ci]):
+          segment.addSynapse(Synapse(self.getInputCell(x, y), perm))
+  
+  def __sampleCandidates(self, numRows, candidates, valid=None, count=1):
+    """
+    Return a (numRows x count) array holding, for each row, count distinct
+    values chosen at random from the valid candidates of the row.  Every 
+    candidate is given a random key and the candidates with the count smallest
+    keys are chosen, processing blocks of rows at a time.
+    @param numRows: number of rows to choose values for.
+    @param candidates: 2d array of the candidate values of every row, or a 
+    single row of candidates shared by all rows.
+    @param valid: boolean array marking which candidates may be chosen (None
+    if all candidates may be chosen).
+    @param count: number of values to choose for each row.
+    """
+    numCandidates = candidates.shape[1]
+    result = numpy.empty((numRows, count), dtype=numpy.int32)
+    chunk = max(1, MAX_INIT_CHUNK_SIZE // numCandidates)
+    for c in xrange(0, numRows, chunk):
+      n = min(chunk, numRows-c)
+      keys = self.rng.random_sample((n, numCandidates))
+      if valid is not None:
+        keys[~valid[c:c+n]] = 2.0 #never choose invalid candidates
+      if count < numCandidates:
+        picks = numpy.argpartition(keys, count-1, axis=1)[:,:count]
+      else:
+        picks = numpy.argsort(keys, axis=1)
+      if len(candidates)==1:
+        result[c:c+n] = candidates[0][picks]
+      else:
+        result[c:c+n] = candidates[c:c+n][numpy.arange(n)[:,None], picks]
+    return result
+  
+  def __sampleDistinct(self, numRows, population, count):
+    """
+    Return a (numRows x count) array holding, for each row, count distinct
+    integers chosen at random from [0, population).  A few more integers than
+    needed are drawn for every row and the first count distinct ones (in draw
+    order) are kept.  Rows that drew too many duplicates, and populations 
+    where duplicates are likely, fall back to choosing by random keys.
+    """
+    allValues = numpy.arange(population)[None,:]
+    if count*4 > population:
+      return self.__sampleCandidates(numRows, allValues, count=count)
+    
+    numDraws = count + 2*(count*count)//population + 8
+    draws = self.rng.randint(0, population, (numRows, numDraws))
+    rows = numpy.arange(numRows)[:,None]
+    order = numpy.argsort(draws, axis=1, kind='mergesort')
+    sortedDraws = draws[rows, order]
+    #mark the first occurrence (in draw order) of each distinct value
+    first = numpy.ones(draws.shape, dtype=numpy.bool_)
+    first[:,1:] = sortedDraws[:,1:] != sortedDraws[:,:-1]
+    distinct = numpy.empty(draws.shape, dtype=numpy.bool_)
+    distinct[rows, order] = first
+    keep = distinct & (numpy.cumsum(distinct, axis=1) <= count)
+    
+    result = numpy.empty((numRows, count), dtype=numpy.int32)
+    full = keep.sum(axis=1)==count
+    result[full] = draws[full][keep[full]].reshape(-1, count)
+    short = numpy.flatnonzero(~full)
+    if len(short) > 0:
+      result[short] = self.__sampleCandidates(len(short), allValues, count=count)
+    return result
+  
   def runOnce(self):
     """
     Run one time step iteration for this Region.  All cells will have their current
@@ -222,22 +445,121 @@ class Region(object):
     state reset to no activity.  Then SpatialPooling following by TemporalPooling is 
     performed for one time step.
     """
-    for col in self.columns:
-      for cell in col.cells:
-        cell.nextTimeStep()
+    self.__nextTimeStep()
     self.__performSpatialPooling()
     self.__performTemporalPooling()
   
+  def __nextTimeStep(self):
+    """
+    Advance all cells to the next time step by swapping the current and previous
+    cell state arrays, then resetting the new current states to no activity.
+    """
+    self.cellWasActive, self.cellActive = self.cellActive, self.cellWasActive
+    self.cellWasPredicted, self.cellPredicting = self.cellPredicting, self.cellWasPredicted
+    self.cellWasLearning, self.cellLearning = self.cellLearning, self.cellWasLearning
+    self.cellActive.fill(False)
+    self.cellPredicting.fill(False)
+    self.cellLearning.fill(False)
+    self.timeStep += 1
+    self.segmentActivity.invalidate()
+    self.learningCellIndex.clear()
+  
+  def getInputCell(self, ix, iy):
+    """
+    Return the (shared) InputCell representing the input bit at position (ix,iy).
+    """
+    inputCell = self.inputCells.get((ix,iy))
+    if inputCell is None:
+      inputCell = InputCell(ix, iy, self)
+      self.inputCells[(ix,iy)] = inputCell
+    return inputCell
+  
+  def getLearningCells(self, column):
+    """
+    Return an array of the flat indices (column.index*cellsPerCol + cell.index)
+    of all the cells that were learning at time t-1 and are within the locality
+    radius of the specified column (or anywhere in the region if the locality
+    radius is 0).  The cells are found by slicing the learning state array over
+    the column grid and are cached for the rest of the time step.
+    @param column: the Column the learning cells must be local to.
+    """
+    key = column.index if self.localityRadius > 0 else None
+    cells = self.learningCellIndex.get(key)
+    if cells is None:
+      learning = self.cellWasLearning.reshape(self.width, self.height, self.cellsPerCol)
+      if key is None:
+        cells = numpy.flatnonzero(learning)
+      else:
+        minX = max(0, column.cx-self.localityRadius)
+        maxX = min(self.width-1, column.cx+self.localityRadius)
+        minY = max(0, column.cy-self.localityRadius)
+        maxY = min(self.height-1, column.cy+self.localityRadius)
+        xs, ys, ii = numpy.nonzero(learning[minX:maxX+1, minY:maxY+1])
+        cells = ((xs+minX)*self.height + (ys+minY))*self.cellsPerCol + ii
+      self.learningCellIndex[key] = cells
+    return cells
+  
   def updateInput(self, newInput):
     """ 
-    Update the values of the inputData for this Region by copying row
-    references from the specified newInput parameter.
+    Update the values of the inputData for this Region by copying the values
+    of the specified newInput parameter (in a single array copy).
     @param newInput: 2d numpy matrix to use for next Region time step.
     The newInput array must have the same shape as the original inputData.
+    A 1d array is instead taken as sparse input (see updateSparseInput).
+    """
+    if numpy.ndim(newInput)==1:
+      self.updateSparseInput(newInput)
+      return
+    assert newInput.shape==self.inputData.shape
+    if newInput is not self.inputData:
+      self.inputData[...] = newInput
+    self.inputBits = None
+  
+  def updateSparseInput(self, activeBits):
+    """
+    Update the values of the inputData for this Region from the indices of
+    the active input bits only, such as the sparse output of a lower Region.
+    The indices are also kept so that a Region in arrays mode can compute
+    its column overlaps from just the synapses of the active bits.
+    @param activeBits: array of flat indices (x*inputHeight + y) of all the
+    active input bits, all other input bits are 0.
+    """
+    activeBits = numpy.asarray(activeBits, dtype=numpy.int32)
+    flat = self.inputData.reshape(-1)
+    flat.fill(0)
+    flat[activeBits] = 1
+    self.inputBits = activeBits
+  
+  def swapInput(self, newInput):
+    """
+    Make the specified array the inputData of this Region without copying it.
+    The Region reads the array in place until the next swap, so the caller 
+    must not modify it while the Region runs.
+    @param newInput: contiguous 2d uint8 (or bool) array of 0/1 input bits with
+    the same shape as the original inputData.
+    @return the previous inputData array, which the caller may reuse as the
+    buffer for a later input.
     """
     assert newInput.shape==self.inputData.shape
-    for i in xrange(len(self.inputData)):
-      self.inputData[i] = newInput[i]
+    if newInput.dtype==numpy.bool_:
+      newInput = newInput.view(numpy.uint8)
+    assert newInput.dtype==numpy.uint8 and newInput.flags.c_contiguous
+    oldInput = self.inputData
+    self.inputData = newInput
+    self.inputBits = None
+    return oldInput
+  
+  def updatePackedInput(self, packedInput):
+    """
+    Update the values of the inputData for this Region from bit-packed input.
+    @param packedInput: uint8 array of the input bits packed 8 per byte (as by
+    numpy.packbits) in the order of the flattened inputData (x*inputHeight + y).
+    """
+    numBits = self.inputData.size
+    bits = numpy.unpackbits(numpy.asarray(packedInput, dtype=numpy.uint8))
+    assert len(bits) >= numBits
+    self.inputData.reshape(-1)[:] = bits[:numBits]
+    self.inputBits = None
   
   def getOutput(self):
     """ 
@@ -256,23 +578,55 @@ class Region(object):
     @return a 2d numpy array of containing the Region's collective output
     (the shape will be based on column grid and cells per column).
     """
-    if self.cellsPerCol < 4:
-      for col in self.columns:
-        for cell in col.cells:
-          cx = (col.cx*self.cellsPerCol) + cell.index
-          self.outData[cx][col.cy] = 0
-          if cell.isActive or cell.isPredicting:
-            self.outData[cx][col.cy] = 1
-    else:
-      for col in self.columns:
-        for cell in col.cells:
-          cx = (col.cx*2) + (cell.index%2)
-          cy = (col.cy*2) + (cell.index/2)
-          self.outData[cx][cy] = 0
-          if cell.isActive or cell.isPredicting:
-            self.outData[cx][cy] = 1
+    #the output of cell i of the column at (cx,cy) is outData[cx*cellsPerCol+i][cy],
+    #or outData[cx*2 + i%2][cy*2 + i/2] for 4 cells, written via outView
+    shape = self.outView.shape
+    numpy.logical_or(self.cellActive.reshape(shape), \
+                     self.cellPredicting.reshape(shape), self.outView)
     return self.outData
   
+  def getSparseOutput(self):
+    """
+    Determine the sparse output of the most recently run time step for this
+    Region: the indices of the bits of the output bit-matrix (see getOutput)
+    that are set because their Cell is active or predicting.  Usually only a
+    few percent of the output bits are set, so the indices are a far smaller
+    hand-off to the next Region in a hierarchy (see updateSparseInput).
+    @return a sorted 1d numpy array of the flat indices (x*outHeight + y) of
+    all the set bits of the Region's output bit-matrix.
+    """
+    cells = numpy.flatnonzero(self.cellActive | self.cellPredicting)
+    return numpy.sort(self.outIndex.take(cells))
+  
+  def freeze(self):
+    """
+    Snapshot this (trained) Region into an inference-only FrozenRegion whose
+    connected proximal and distal synapses are compiled into read-only index
+    arrays.  Running the FrozenRegion gives the same active and predicting 
+    cells as running this Region with spatial and temporal learning off, 
+    but without walking any of the Column, Cell or Segment objects.
+    @return a new FrozenRegion holding the current connections and state.
+    """
+    return FrozenRegion(self)
+  
+  def startSharding(self, numShards):
+    """
+    Perform the spatial pooling of this Region (in arrays mode) with the
+    column grid partitioned into tiles, each owned by one of numShards worker
+    processes sharing the Region's input and proximal synapses in shared
+    memory (see ShardedSpatialPooler).  The winning columns are the same as
+    with single process spatial pooling.
+    @param numShards: number of tiles (and worker processes) to use.
+    """
+    self.stopSharding()
+    self.sharding = ShardedSpatialPooler(self, numShards)
+  
+  def stopSharding(self):
+    """ Stop any sharding worker processes and return to single process spatial pooling. """
+    if self.sharding:
+      self.sharding.close()
+      self.sharding = None
+  
   def __performSpatialPooling(self):
     """
     Perform SpatialPooling for the current input in this Region.
@@ -311,29 +665,73 @@ class Region(object):
     Note: once learning is turned off, boost(c) is frozen.
     Finally at the end of Phase 3 the inhibition radius is recomputed (line 38).
     """
-    #Phase 1: Compute Column Input Overlaps
-    for col in self.columns:
-      col.computeOverlap()
-    
-    #Phase 2: Compute Active Columns (Winners after inhibition)
-    for col in self.columns:
-      col.isActive = False
-      if col.overlap > 0:
-        minLocalActivity = self.__kthScore(self.neighbors(col), self.desiredLocalActivity)
-        if(col.overlap >= minLocalActivity):
-          col.isActive = True
+    if self.sharding:
+      #Phases 1 and 2 performed per tile by the sharding worker processes
+      self.sharding.computeActiveColumns()
+    else:
+      #Phase 1: Compute Column Input Overlaps
+      if self.proximalPool:
+        activeCounts = self.proximalPool.getActiveCounts(self.inputData, self.inputBits)
+      else:
+        activeCounts = [len(col.proximalSegment.getActiveSynapses()) for col in self.columns]
+      activeCounts = numpy.reshape(activeCounts, self.overlapGrid.shape)
+      self.overlapGrid[:] = numpy.where(activeCounts < self.minOverlap, 0, \
+                                        activeCounts*self.boostGrid)
+      
+      #Phase 2: Compute Active Columns (Winners after inhibition)
+      irad = int(round(self.inhibitionRadius))
+      self.activeGrid[:] = self.inhibition.getActiveColumns(self.overlapGrid, irad, \
+                                                            self.desiredLocalActivity)
     
     #Phase 3: Synapse Boosting (Learning)
     if self.spatialLearning:
-      for col in self.columns:
-        if col.isActive:
-          col.updatePermanences()
-      
-      for col in self.columns:
-        col.performBoosting()
+      if self.sharding:
+        lowOverlap = self.__performBoosting()
+        self.sharding.updatePermanences(lowOverlap, 0.1*Synapse.CONNECTED_PERM)
+      elif self.proximalPool:
+        #learning and boosting permanence changes applied in one batch
+        lowOverlap = self.__performBoosting()
+        self.proximalPool.updatePermanences(self.inputData, self.activeGrid.ravel(), \
+                                            lowOverlap.ravel(), 0.1*Synapse.CONNECTED_PERM)
+      else:
+        for col in self.columns:
+          if col.isActive:
+            col.updatePermanences()
+        
+        lowOverlap = self.__performBoosting()
+        for cx, cy in zip(*numpy.nonzero(lowOverlap)):
+          self.columnGrid[cx][cy].increasePermanences(0.1*Synapse.CONNECTED_PERM)
       
       self.inhibitionRadius = self.__averageReceptiveFieldSize()
   
+  def __performBoosting(self):
+    """
+    Update the duty cycles and boosts of all columns at once (see
+    Column.performBoosting for the details of the boosting rules).  
+    The minimum desired duty cycle of each column is 1% of the maximum 
+    active duty cycle of its neighbors (as of the start of this step), 
+    found with a sliding window max filter over the column grid.
+    @return a 2d boolean grid of the columns whose overlap duty cycle fell 
+    below their minimum duty cycle; these columns should get the permanences 
+    of all their proximal synapses increased.
+    """
+    irad = int(round(self.inhibitionRadius))
+    minDutyCycle = 0.01 * neighborhoodMax(self.activeDutyGrid, irad)
+    
+    self.activeDutyGrid *= (1.0 - EMA_ALPHA)
+    self.activeDutyGrid[self.activeGrid] += EMA_ALPHA
+    
+    activeDuty = self.activeDutyGrid
+    boost = numpy.where(activeDuty==0.0, self.boostGrid*1.05, 1.0)
+    lowDuty = (activeDuty <= minDutyCycle) & (activeDuty > 0.0)
+    boost[lowDuty] = minDutyCycle[lowDuty] / activeDuty[lowDuty]
+    self.boostGrid[:] = boost
+    
+    self.overlapDutyGrid *= (1.0 - EMA_ALPHA)
+    self.overlapDutyGrid[self.overlapGrid > self.minOverlap] += EMA_ALPHA
+    
+    return self.overlapDutyGrid < minDutyCycle
+  
   def neighbors(self, column):
     """
     Return the list of all the columns that are within inhibitionRadius of the input column.
@@ -351,29 +749,50 @@ class Region(object):
       for y in xrange(y0, y1):
         yield self.columnGrid[x][y]
   
-  def __kthScore(self, cols, k):
-    """ Given the list of columns, return the k'th highest overlap value. """
-    sorted = []
-    for c in cols:
-      sorted.append(c.overlap)
-    sorted.sort()
-    i = max(0, min(len(sorted)-1, len(sorted)-k))
-    return sorted[i]
-
   def __averageReceptiveFieldSize(self):
     """
     The radius of the average connected receptive field size of all the columns. 
     The connected receptive field size of a column includes only the connected 
     synapses (those with permanence values >= connectedPerm). This is used to 
     determine the extent of lateral inhibition between columns.
+    The average is maintained from running sums that are updated as synapses
+    change connection state (see updateReceptiveField), the full set of
+    connected synapses is only rescanned if Synapse.CONNECTED_PERM changes.
     @return the average connected receptive field size (in column grid space).
     """
-    dists = [] 
-    for col in self.columns: 
-      for syn in col.getConnectedSynapses():
-        d = ((col.ix-syn.inputSource.ix)**2 + (col.iy-syn.inputSource.iy)**2)**0.5
-        dists.append(d / self.xSpace)
-    return sum(dists) / len(dists)
+    if self.receptiveFieldPerm!=Synapse.CONNECTED_PERM:
+      self.__resetReceptiveField()
+    return self.receptiveFieldSum / self.receptiveFieldCount
+  
+  def __resetReceptiveField(self):
+    """
+    Recompute the running receptive field sums by scanning the connected
+    proximal synapses of every column.
+    """
+    if self.proximalPool:
+      distSum, count = self.proximalPool.getConnectedDistanceSum()
+    else:
+      dists = [] 
+      for col in self.columns: 
+        for syn in col.getConnectedSynapses():
+          dists.append(col.getSynapseDistance(syn))
+      distSum, count = sum(dists), len(dists)
+    self.receptiveFieldSum = distSum
+    self.receptiveFieldCount = count
+    self.receptiveFieldPerm = Synapse.CONNECTED_PERM
+  
+  def updateReceptiveField(self, distance, count):
+    """
+    Update the running receptive field sums after proximal synapses have
+    crossed the Synapse.CONNECTED_PERM threshold.
+    @param distance: total distance (in column grid space) of the synapses'
+    input bits from their columns, negative for synapses that just became
+    disconnected.
+    @param count: number of synapses that just became connected minus the
+    number that just became disconnected.
+    """
+    self.receptiveFieldSum += distance
+    self.receptiveFieldCount += count
   
   
   def __performTemporalPooling(self):
@@ -439,52 +858,54 @@ class Region(object):
     #41.     segmentUpdateList.add(sUpdate)
     
     #Phase 1: Compute cell active states and segment learning updates
-    for col in self.columns:
-      if col.isActive:
-        buPredicted = False
-        learningCellChosen = False
-        for cell in col.cells:
-          if cell.wasPredicted:
-            segment = cell.getPreviousActiveSegment()
-            
-            if segment and segment.isSequence:
-              buPredicted = True
-              cell.isActive = True
-              
-              if self.temporalLearning and segment.wasActiveFromLearning():
-                learningCellChosen = True
-                cell.isLearning = True
-                #print "learning cell ",col.cx,col.cy
-        
-        if not buPredicted:
-          for cell in col.cells:
+    for ci in numpy.flatnonzero(self.activeGrid):
+      col = self.columns[ci]
+      buPredicted = False
+      learningCellChosen = False
+      for cell in col.cells:
+        if cell.wasPredicted:
+          segment = cell.getPreviousActiveSegment()
+          
+          if segment and segment.isSequence:
+            buPredicted = True
             cell.isActive = True
             
-        if self.temporalLearning and not learningCellChosen:
-          bestCell, bestSeg = col.getBestMatchingCell(isSequence=True, previous=True)
-          bestCell.isLearning = True
-          
-          segmentToUpdate = bestCell.getSegmentActiveSynapses(previous=True, \
-                                                              segment=bestSeg, \
-                                                              newSynapses=True)
-          segmentToUpdate.isSequence = True
-          segList = self.segmentUpdateMap.get(bestCell, [])
-          segList.append(segmentToUpdate)
-          self.segmentUpdateMap[bestCell] = segList
-          
-          #bestSeg may be partial-sort-of match, but it could dec-perm
-          #other syns from different step if cell overlaps...
-          
-          #try better minOverlap to prevent bad boosting?
-          #try to disable learning if predictions match heavily?
+            if self.temporalLearning and segment.wasActiveFromLearning():
+              learningCellChosen = True
+              cell.isLearning = True
+              #print "learning cell ",col.cx,col.cy
+      
+      if not buPredicted:
+        for cell in col.cells:
+          cell.isActive = True
           
-          #Do we need to enforce max segments per cell?
+      if self.temporalLearning and not learningCellChosen:
+        bestCell, bestSeg = col.getBestMatchingCell(isSequence=True, previous=True)
+        bestCell.isLearning = True
+        
+        segmentToUpdate = bestCell.getSegmentActiveSynapses(previous=True, \
+                                                            segment=bestSeg, \
+                                                            newSynapses=True)
+        segmentToUpdate.isSequence = True
+        self.__queueUpdate(bestCell, segmentToUpdate)
+        
+        #bestSeg may be partial-sort-of match, but it could dec-perm
+        #other syns from different step if cell overlaps...
+        
+        #try better minOverlap to prevent bad boosting?
+        #try to disable learning if predictions match heavily?
+        
+        #Do we need to enforce max segments per cell?
 #          if not bestSeg:
 #            print "New seqSegment on col ",col.ix,col.iy
 #          else:
 #            print "Update segSegment on cel ",col.ix,col.iy
 
-          
+        
+    #cell active states at t are now known, so any segment activity at t
+    #computed from the previous states is out of date
+    self.segmentActivity.invalidate(previous=False)
+    
     #Phase2
     #42. for c, i in cells
     #43.   for s in segments(c, i)
@@ -498,39 +919,41 @@ class Region(object):
     #51.       predUpdate = getSegmentActiveSynapses(
     #52.                                   c, i, predSegment, t-1, true)
     #53.       segmentUpdateList.add(predUpdate)
-    for col in self.columns:
-      for cell in col.cells:
-        activeSegs = set({})
-        for seg in cell.segments:
-          if seg.isActive():
-            cell.isPredicting = True
-            activeSegs.add(seg)
-            
-            #a) reinforcement of the currently active segment, and 
-            if self.temporalLearning:
-              activeSegUpdate = cell.getSegmentActiveSynapses(segment=seg)
-              segList = self.segmentUpdateMap.get(cell, [])
-              segList.append(activeSegUpdate)
-              self.segmentUpdateMap[cell] = segList
-            break
-        
-        #b) reinforcement of a segment that could have predicted 
-        #   this activation, i.e. a segment that has a (potentially weak)
-        #   match to activity during the previous time step (lines 50-53).
-        if self.temporalLearning and cell.isPredicting:
-          predSegment = cell.getBestMatchingSegment(isSequence=False, previous=True)
+    #only cells with at least one active segment (found by following the
+    #synapses of the active cells) can become predicting, visit just those
+    #in the same (column, cell) order as a full scan of the region
+    activeSegments = self.segmentActivity.getActiveSegments()
+    for seg in activeSegments:
+      seg.lastActiveStep = self.timeStep
+    predictingCells = set(seg.cell for seg in activeSegments)
+    for cell in sorted(predictingCells, key=lambda c: c.statePos):
+      activeSegs = set({})
+      for seg in cell.segments:
+        if seg.isActive():
+          cell.isPredicting = True
+          activeSegs.add(seg)
+          
+          #a) reinforcement of the currently active segment, and 
+          if self.temporalLearning:
+            activeSegUpdate = cell.getSegmentActiveSynapses(segment=seg)
+            self.__queueUpdate(cell, activeSegUpdate)
+          break
+      
+      #b) reinforcement of a segment that could have predicted 
+      #   this activation, i.e. a segment that has a (potentially weak)
+      #   match to activity during the previous time step (lines 50-53).
+      if self.temporalLearning and cell.isPredicting:
+        predSegment = cell.getBestMatchingSegment(isSequence=False, previous=True)
 #          if predSegment:
 #            if not predSegment:
 #              print "New predSegment on col ",col.irow,col.icol
 #            elif predSegment not in activeSegs:
 #              print "predSegment update 2x on col",col.irow,col.icol
-          #TODO if predSegment is None, do we still add new? ok if same as above seg?
-          predSegUpdate = cell.getSegmentActiveSynapses(previous=True, \
-                                                        segment=predSegment, \
-                                                        newSynapses=True)
-          segList = self.segmentUpdateMap.get(cell, [])
-          segList.append(predSegUpdate)
-          self.segmentUpdateMap[cell] = segList
+        #TODO if predSegment is None, do we still add new? ok if same as above seg?
+        predSegUpdate = cell.getSegmentActiveSynapses(previous=True, \
+                                                      segment=predSegment, \
+                                                      newSynapses=True)
+        self.__queueUpdate(cell, predSegUpdate)
     
     #Phase3
     #54. for c, i in cells
@@ -543,18 +966,61 @@ class Region(object):
     self.recentUpdateMap.clear()
     if not self.temporalLearning:
       return
-    for col in self.columns:
-      for cell in col.cells:
-        if cell not in self.segmentUpdateMap:
-          continue
-        if cell.isLearning:
-          #print "cell from (",col.ix,col.iy,") adapted positive"
-          self.adaptSegments(self.segmentUpdateMap[cell], positiveReinforcement=True)
-          self.recentUpdateMap[cell] = self.segmentUpdateMap.pop(cell)
-        elif not cell.isPredicting and cell.wasPredicted:
-          #print "cell from (",col.ix,col.iy,") adapted negative"
-          self.adaptSegments(self.segmentUpdateMap[cell], positiveReinforcement=False)
-          self.recentUpdateMap[cell] = self.segmentUpdateMap.pop(cell)
+    #only cells with queued updates need be visited (in column, cell order)
+    for cell in sorted(self.segmentUpdateMap, key=lambda c: c.statePos):
+      if cell.isLearning:
+        #print "cell from (",col.ix,col.iy,") adapted positive"
+        segList = self.segmentUpdateMap.pop(cell)
+        self.queuedUpdates -= len(segList)
+        self.adaptSegments(segList, positiveReinforcement=True)
+        self.recentUpdateMap[cell] = segList
+      elif not cell.isPredicting and cell.wasPredicted:
+        #print "cell from (",col.ix,col.iy,") adapted negative"
+        segList = self.segmentUpdateMap.pop(cell)
+        self.queuedUpdates -= len(segList)
+        self.adaptSegments(segList, positiveReinforcement=False)
+        self.recentUpdateMap[cell] = segList
+      elif self.maxUpdateAge > 0:
+        self.__expireUpdates(cell)
+  
+  def __queueUpdate(self, cell, segInfo):
+    """
+    Add a segment update to the queue of the cell, to be applied once the cell
+    is learning (or stops predicting).  If the cell already holds the maximum
+    number of queued updates the oldest one expires.
+    """
+    segList = self.segmentUpdateMap.get(cell, [])
+    segList.append(segInfo)
+    self.segmentUpdateMap[cell] = segList
+    self.queuedUpdates += 1
+    if self.maxUpdatesPerCell > 0 and len(segList) > self.maxUpdatesPerCell:
+      del segList[0]
+      self.queuedUpdates -= 1
+      self.expiredUpdates += 1
+  
+  def __expireUpdates(self, cell):
+    """
+    Discard the queued segment updates of the cell that are older than 
+    maxUpdateAge time steps, dropping the cell's queue once it is empty.
+    """
+    segList = self.segmentUpdateMap[cell]
+    oldest = self.timeStep - self.maxUpdateAge
+    if segList[0].timeStep < oldest: #updates are queued in time order
+      keep = [segInfo for segInfo in segList if segInfo.timeStep >= oldest]
+      self.queuedUpdates -= len(segList) - len(keep)
+      self.expiredUpdates += len(segList) - len(keep)
+      if keep:
+        self.segmentUpdateMap[cell] = keep
+      else:
+        del self.segmentUpdateMap[cell]
+  
+  def getUpdateQueueDepth(self):
+    """
+    Return the number of cells with queued segment updates and the total number
+    of queued segment updates (the sampled learning cells of each are retained 
+    until the update is applied or expires).
+    """
+    return len(self.segmentUpdateMap), self.queuedUpdates
   
   
   def adaptSegments(self, segmentUpdateList, positiveReinforcement):
@@ -569,44 +1035,82 @@ class Region(object):
     any synapses in segmentUpdate that do yet exist get added with a permanence 
     count of initialPerm. These new synapses are randomly chosen from the 
     set of all cells that have learnState output = 1 at time step t.
+    
+    If the Region limits distal growth (maxSegmentsPerCell or maxSynapsesPerSegment)
+    the lowest permanence synapses of a segment are removed to make room for new
+    ones, and synapses whose permanence reached 0.0 are removed after the update.
     """
     for segInfo in segmentUpdateList:
-      if segInfo.segment:
-        if positiveReinforcement:
-          for syn in segInfo.segment.synapses:
-            if syn in segInfo.activeSynapses:
-              syn.increasePermanence()
-            else:
-              syn.decreasePermanence()
-        else:
-          for syn in segInfo.activeSynapses:
-            syn.decreasePermanence()
+      segment = segInfo.segment
+      if segment:
+        if self.boundedGrowth and segment not in segInfo.cell.segments:
+          continue #segment was removed after this update was queued
+        segment.adaptSynapses(segInfo.activeSynapses, positiveReinforcement)
       
       #add new synapses (and new segment if necessary)
-      segment = segInfo.segment
       if segInfo.addNewSynapses and positiveReinforcement:
+        learningCells = segInfo.learningCells
+        if self.maxSynapsesPerSegment > 0:
+          learningCells = learningCells[:self.maxSynapsesPerSegment]
         if not segInfo.segment:
-          if len(segInfo.learningCells) > 0: #only add if learning cells available
-            segment = segInfo.cell.createSegment(segInfo.learningCells)
+          if len(learningCells) > 0: #only add if learning cells available
+            segment = segInfo.cell.createSegment(learningCells)
             segInfo.addedSynapses = segment.synapses
             segment.isSequence = segInfo.isSequence
-        elif len(segInfo.learningCells) > 0:
+        elif len(learningCells) > 0:
           #add new synapses to existing segment
-          added = segInfo.segment.createSynapsesToLearningCells(segInfo.learningCells)
+          self.__evictSynapses(segment, len(learningCells))
+          added = segment.createSynapsesToLearningCells(learningCells)
           segInfo.addedSynapses = added
+      
+      if segment and self.boundedGrowth:
+        if positiveReinforcement:
+          segment.lastActiveStep = self.timeStep
+        self.__pruneSynapses(segInfo.cell, segment)
+  
+  def __evictSynapses(self, segment, newCount):
+    """
+    Remove the lowest permanence synapses of the segment (the oldest first among
+    equal permanences) so newCount synapses can be added without exceeding 
+    maxSynapsesPerSegment.
+    """
+    if self.maxSynapsesPerSegment <= 0:
+      return
+    excess = len(segment.synapses) + newCount - self.maxSynapsesPerSegment
+    if excess > 0:
+      synapses = sorted(segment.synapses, key=lambda syn: syn.permanence)
+      segment.removeSynapses(synapses[:excess])
+      self.prunedSynapses += excess
+  
+  def __pruneSynapses(self, cell, segment):
+    """
+    Remove the synapses of the segment whose permanence decayed to 0.0, and
+    remove the segment itself from the cell if it has no synapses left.
+    """
+    deadSyns = [syn for syn in segment.synapses if syn.permanence <= 0.0]
+    if deadSyns:
+      segment.removeSynapses(deadSyns)
+      self.prunedSynapses += len(deadSyns)
+    if not segment.synapses:
+      cell.removeSegment(segment)
   
 
 
 class InputCell(object):
   """
-  Represent a single input bit from an external source.
+  Represent a single input bit from an external source.  A Region creates one
+  InputCell per input bit which is shared by all the synapses connected to it.
+  The bit is read from the Region's current inputData so the input array may
+  be swapped (see Region.swapInput).
   """
   
-  def __init__(self, ix, iy, inputData):
+  __slots__ = ('ix', 'iy', 'region')
+  
+  def __init__(self, ix, iy, region):
     self.ix = ix
     self.iy = iy
-    self.inputData = inputData
+    self.region = region
     
   @property
   def isActive(self):
-    return self.inputData[self.ix][self.iy]
+    return self.region.inputData[self.ix, self.iy]
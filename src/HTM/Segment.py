@@ -15,16 +15,33 @@ class Segment(object):
   respectively) however the class object itself does not need to know which
   it ultimately is as they behave identically.  Segments are considered 'active' 
   if enough of its existing synapses are connected and individually active.
+  
+  Distal segments may share a SegmentActivity cache (owned by their Region) 
+  so the activity of each segment is only determined once per time step no
+  matter how many times it is queried.
   """
   
-  def __init__(self, segActiveThreshold):
+  __slots__ = ('synapses', 'isSequence', 'segActiveThreshold', 'activity', 
+               'cell', 'lastActiveStep')
+  
+  def __init__(self, segActiveThreshold, activity=None, cell=None):
+    """
+    @param segActiveThreshold: number of active synapses to activate the segment.
+    @param activity: optional SegmentActivity cache to read segment activity from.
+    @param cell: the Cell the (distal) segment belongs to, if any.
+    """
     self.synapses = []
     self.isSequence = False
     self.segActiveThreshold = segActiveThreshold
+    self.activity = activity
+    self.cell = cell
+    self.lastActiveStep = 0 #Region time step the segment was last active/reinforced
   
   def addSynapse(self, synapse):
     """ Add the specified synapse object to this segment. """
     self.synapses.append(synapse)
+    if self.activity:
+      self.activity.addSynapse(self, synapse)
   
   def createSynapse(self, inputSource):
     """ 
@@ -33,9 +50,19 @@ class Segment(object):
     @return the newly created synapse.
     """
     newSyn = Synapse(inputSource)
-    self.synapses.append(newSyn)
+    self.addSynapse(newSyn)
     return newSyn
     
+  def removeSynapses(self, synapses):
+    """
+    Remove the specified synapses from this segment.
+    @param synapses: list of this segment's synapses to remove.
+    """
+    removed = set(synapses)
+    self.synapses = [syn for syn in self.synapses if syn not in removed]
+    if self.activity:
+      self.activity.removeSynapses(self, synapses)
+  
   def createSynapsesToLearningCells(self, synapseCells):
     """
     Create numSynapses new synapses for this segment attached to the specified
@@ -57,11 +84,36 @@ class Segment(object):
     """
     return [syn for syn in self.synapses if syn.isConnected]
   
+  def adaptSynapses(self, activeSynapses, positiveReinforcement):
+    """
+    Reinforce the synapses of this segment given the list of its synapses that 
+    were active for a segment update.  If positiveReinforcement is true then 
+    the active synapses get their permanence incremented and all other synapses
+    get their permanence decremented, otherwise only the active synapses get 
+    their permanence decremented.
+    @param activeSynapses: list of this segment's synapses that were active.
+    @param positiveReinforcement: true to reinforce, false to only punish.
+    """
+    if positiveReinforcement:
+      activeSynapses = set(activeSynapses)
+      for syn in self.synapses:
+        if syn in activeSynapses:
+          syn.increasePermanence()
+        else:
+          syn.decreasePermanence()
+    else:
+      for syn in activeSynapses:
+        syn.decreasePermanence()
+    if self.activity:
+      self.activity.discard(self)
+  
   def getActiveSynapses(self, connectedOnly=True):
     """
     Return a list of all the currently active (firing) synapses on this segment.
     @param connectedOnly: only consider if active if a synapse is connected.
     """
+    if self.activity and connectedOnly:
+      return list(self.activity.getCurrent(self)[0])
     return [syn for syn in self.synapses if syn.isActive(connectedOnly)]
   
   def getPrevActiveSynapses(self, connectedOnly=True):
@@ -69,27 +121,180 @@ class Segment(object):
     Return a list of all the previously active (firing) synapses on this segment.
     @param connectedOnly: only consider if active if a synapse is connected.
     """
+    if self.activity and connectedOnly:
+      return list(self.activity.getPrevious(self)[0])
     return [syn for syn in self.synapses if syn.wasActive(connectedOnly)]
   
+  def getActiveCount(self, connectedOnly=True):
+    """
+    Return the number of currently active (firing) synapses on this segment.
+    @param connectedOnly: only count a synapse as active if it is connected.
+    """
+    if self.activity:
+      entry = self.activity.getCurrent(self)
+      return len(entry[0]) if connectedOnly else entry[1]
+    return len(self.getActiveSynapses(connectedOnly))
+  
+  def getPrevActiveCount(self, connectedOnly=True):
+    """
+    Return the number of previously active (firing) synapses on this segment.
+    @param connectedOnly: only count a synapse as active if it is connected.
+    """
+    if self.activity:
+      entry = self.activity.getPrevious(self)
+      return len(entry[0]) if connectedOnly else entry[1]
+    return len(self.getPrevActiveSynapses(connectedOnly))
+  
+  def getPrevLearningCount(self):
+    """
+    Return the number of connected synapses on this segment that were active
+    due to learning states at time t-1.
+    """
+    if self.activity:
+      return self.activity.getPrevious(self)[2]
+    return len([syn for syn in self.synapses if syn.wasActiveFromLearning()])
+  
   def isActive(self):
     """
     This routine returns true if the number of connected synapses on this segment 
     that are active due to active states at time t is greater than activationThreshold. 
     """
-    return len(self.getActiveSynapses()) >= self.segActiveThreshold
+    return self.getActiveCount() >= self.segActiveThreshold
   
   def wasActive(self):
     """
     This routine returns true if the number of connected synapses on this segment 
     that were active due to active states at time t-1 is greater than activationThreshold. 
     """
-    return len(self.getPrevActiveSynapses()) >= self.segActiveThreshold
+    return self.getPrevActiveCount() >= self.segActiveThreshold
   
   def wasActiveFromLearning(self):
     """
     This routine returns true if the number of connected synapses on this segment 
     that were active due to learning states at time t-1 is greater than activationThreshold. 
     """
-    learningSyns = [syn for syn in self.getPrevActiveSynapses() if syn.wasActiveFromLearning()]
-    return len(learningSyns) >= self.segActiveThreshold
+    return self.getPrevLearningCount() >= self.segActiveThreshold
+
+
+class SegmentActivity(object):
+  """
+  A per time step cache of the synapse activity of segments.  For each segment
+  the connected active synapses and the number of potential (connected or not)
+  active synapses are determined once for time t, and likewise for time t-1 
+  along with the number of connected synapses active from learning cells.
+  The Region invalidates the cache whenever cell states move to a new time step
+  (or become final for time t), and discards a segment's entries whenever its
+  synapses are changed.
+  
+  The cache also keeps a reverse index from every presynaptic cell to the 
+  synapses that reference it.  The activity at time t is then found for all
+  segments at once by visiting only the synapses of the currently active cells,
+  any segment not reached this way has no active synapses at all.
+  """
+  
+  def __init__(self, region):
+    """
+    @param region: the Region whose cell state arrays hold the cell activity.
+    """
+    self.region = region
+    self.current = {}  #segment -> (activeSynapses, potentialCount) at t
+    self.previous = {} #segment -> (activeSynapses, potentialCount, learningCount) at t-1
+    self.currentComplete = False #True once current holds every reached segment
+    #flat cell index (column.index*cellsPerCol + cell.index) -> [(segment, synapse)]
+    self.presynaptic = {}
+  
+  def getCellIndex(self, cell):
+    """ Return the flat index of the cell within the Region's cell state arrays. """
+    col, i = cell.statePos
+    return col*self.region.cellsPerCol + i
+  
+  def addSynapse(self, segment, synapse):
+    """ Record a new synapse of the segment in the presynaptic cell index. """
+    i = self.getCellIndex(synapse.inputSource)
+    self.presynaptic.setdefault(i, []).append((segment, synapse))
+    self.discard(segment)
+  
+  def removeSynapses(self, segment, synapses):
+    """ Remove synapses that were removed from the segment from the presynaptic cell index. """
+    for syn in synapses:
+      self.presynaptic[self.getCellIndex(syn.inputSource)].remove((segment, syn))
+    self.discard(segment)
+  
+  def removeSegment(self, segment):
+    """ Forget a segment removed from its cell (its synapses must already be removed). """
+    self.discard(segment)
+  
+  def invalidate(self, previous=True):
+    """
+    Discard all cached activity at time t (and also at t-1 if previous is True).
+    """
+    self.current.clear()
+    self.currentComplete = False
+    if previous:
+      self.previous.clear()
+  
+  def discard(self, segment):
+    """ Discard the cached activity of a segment whose synapses changed. """
+    if segment in self.current:
+      self.invalidate(previous=False)
+    self.previous.pop(segment, None)
+  
+  def updateCurrent(self):
+    """
+    Determine the activity at time t of every segment with at least one synapse
+    from a currently active cell by walking the presynaptic index of those cells.
+    """
+    current = {}
+    presynaptic = self.presynaptic
+    for i in self.region.cellActive.ravel().nonzero()[0]:
+      for segment, syn in presynaptic.get(i, ()):
+        entry = current.get(segment)
+        if entry is None:
+          entry = current[segment] = [[], 0]
+        entry[1] += 1
+        if syn.isConnected:
+          entry[0].append(syn)
+    for segment, entry in current.iteritems():
+      current[segment] = tuple(entry)
+    self.current = current
+    self.currentComplete = True
+  
+  def getActiveSegments(self):
+    """ Return a list of all the segments that are active at time t. """
+    if not self.currentComplete:
+      self.updateCurrent()
+    return [seg for seg, entry in self.current.iteritems() \
+            if len(entry[0]) >= seg.segActiveThreshold]
+  
+  def getCurrent(self, segment):
+    """
+    Return a tuple of the list of connected synapses of the segment that are 
+    active at time t and the number of all its synapses active at time t.
+    """
+    if not self.currentComplete:
+      self.updateCurrent()
+    return self.current.get(segment, ((), 0))
+  
+  def getPrevious(self, segment):
+    """
+    Return a tuple of the list of connected synapses of the segment that were
+    active at time t-1, the number of all its synapses active at t-1, and the
+    number of connected synapses that were active from learning cells at t-1.
+    """
+    entry = self.previous.get(segment)
+    if entry is None:
+      activeSyns = []
+      potentialCount = 0
+      learningCount = 0
+      for syn in segment.synapses:
+        source = syn.inputSource
+        if source.wasActive:
+          potentialCount += 1
+          if syn.isConnected:
+            activeSyns.append(syn)
+            if source.wasLearning:
+              learningCount += 1
+      entry = (activeSyns, potentialCount, learningCount)
+      self.previous[segment] = entry
+    return entry
   
\ No newline at end of file
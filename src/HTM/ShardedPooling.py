@@ -0,0 +1,245 @@
+"""
+Created on Oct 16, 2026
+
+Column-sharded spatial pooling of an HTM Region across worker processes.
+
+For a large column grid nearly all the time spent in spatial pooling goes to
+computing the overlap of every Column and to the permanence learning of the
+winning Columns, and both only involve each Column's own proximal synapses.
+A ShardedSpatialPooler (see Region.startSharding) partitions the column grid
+into tiles, each a slab of whole grid rows x0:x1 (so its Columns are a
+contiguous block of the proximal pool arrays), and hands every tile to its
+own worker process.
+
+The input bits, proximal synapse arrays and column grids are all moved into
+shared memory, so the workers read and write them in place and nothing is
+pickled per time step.  Every time step runs in three phases, each followed
+by all the workers reporting back before the next begins:
+
+overlap: each worker computes the overlaps of the Columns of its tile.
+inhibition: each worker inhibits its tile using the overlaps of the tile plus
+  a halo of inhibitionRadius grid rows (at least 1) on either side, which is
+  every Column within the inhibition radius of the tile's Columns, so the
+  winning Columns are exactly those of the single process Region.
+learning: each worker updates the permanences of its tile's Columns and
+  reports the change to the connected synapses; the Region adjusts its
+  receptive field sums from the reports.
+
+Boosting and the inhibition radius update remain in the Region's process,
+they are cheap whole-grid array operations.  The running receptive field
+sums are accumulated per tile, so they may differ from the single process
+Region in the last bits of rounding.
+"""
+
+import numpy
+import multiprocessing
+from HTM.Synapse import Synapse
+from HTM.Inhibition import Inhibition
+from HTM.ProximalPool import adaptPermanences
+
+WAIT_TIMEOUT = 1.0 #seconds between checks that the workers are still alive
+
+#worker commands
+STOP = 0
+OVERLAP = 1
+INHIBIT = 2
+LEARN = 3
+
+#slots of the shared parameter array, set by the Region's process before
+#each command (so changes to the Synapse constants reach the workers)
+COMMAND = 0
+RADIUS = 1
+LOCAL_ACTIVITY = 2
+MIN_OVERLAP = 3
+CONNECTED_PERM = 4
+PERMANENCE_INC = 5
+PERMANENCE_DEC = 6
+BOOST_AMOUNT = 7
+NUM_PARAMS = 8
+
+def _allocate(typecode, array):
+  """
+  Return a shared memory RawArray holding a copy of the given numpy array.
+  """
+  raw = multiprocessing.RawArray(typecode, array.size)
+  _view(raw, array.dtype, array.shape)[...] = array
+  return raw
+
+def _view(raw, dtype, shape):
+  """ Return a numpy array of the given dtype and shape viewing a RawArray. """
+  return numpy.frombuffer(raw, dtype=dtype).reshape(shape)
+
+def _runShard(shard, x0, x1, buffers, shapes, start, done):
+  """
+  Worker process: perform the commands given by the Region's process for the
+  Columns of grid rows x0:x1 until told to stop.
+  """
+  w, h = shapes['grid']
+  rows = slice(x0*h, x1*h)
+  inputBits = _view(buffers['input'], numpy.uint8, shapes['input']).ravel()
+  inputIndex = _view(buffers['inputIndex'], numpy.int32, shapes['pool'])[rows]
+  permanence = _view(buffers['permanence'], numpy.float64, shapes['pool'])[rows]
+  distance = _view(buffers['distance'], numpy.float64, shapes['pool'])[rows]
+  overlapGrid = _view(buffers['overlap'], numpy.float64, (w, h))
+  activeGrid = _view(buffers['active'], numpy.bool_, (w, h))
+  boostGrid = _view(buffers['boost'], numpy.float64, (w, h))
+  boostedGrid = _view(buffers['boosted'], numpy.bool_, (w, h))
+  params = _view(buffers['params'], numpy.float64, (NUM_PARAMS,))
+  results = _view(buffers['results'], numpy.float64, (-1, 3))
+
+  inhibition = None #Inhibition of the tile plus halo, kept while the halo is unchanged
+  while True:
+    start.acquire()
+    command = int(params[COMMAND])
+    if command==STOP:
+      break
+    Synapse.CONNECTED_PERM = params[CONNECTED_PERM]
+    Synapse.PERMANENCE_INC = params[PERMANENCE_INC]
+    Synapse.PERMANENCE_DEC = params[PERMANENCE_DEC]
+
+    if command==OVERLAP:
+      active = inputBits.take(inputIndex) != 0
+      active &= permanence >= Synapse.CONNECTED_PERM
+      activeCounts = active.sum(axis=1).reshape(x1-x0, h)
+      overlapGrid[x0:x1] = numpy.where(activeCounts < params[MIN_OVERLAP], 0, \
+                                       activeCounts*boostGrid[x0:x1])
+    elif command==INHIBIT:
+      radius = int(params[RADIUS])
+      halo = max(1, radius)
+      lo = max(0, x0-halo)
+      hi = min(w, x1+halo)
+      if inhibition is None or inhibition.width!=hi-lo:
+        inhibition = Inhibition(hi-lo, h)
+      active = inhibition.getActiveColumns(overlapGrid[lo:hi], radius, \
+                                           int(params[LOCAL_ACTIVITY]))
+      activeGrid[x0:x1] = active[x0-lo:x1-lo]
+    elif command==LEARN:
+      change = adaptPermanences(permanence, inputIndex, distance, inputBits, \
+                                activeGrid[x0:x1].ravel(), boostedGrid[x0:x1].ravel(), \
+                                params[BOOST_AMOUNT])
+      if change is None:
+        results[shard] = (0, 0.0, 0)
+      else:
+        results[shard] = (1, change[0], change[1])
+    done.release()
+
+
+class ShardedSpatialPooler(object):
+  """
+  Perform the spatial pooling of a Region in arrays mode with the column
+  grid partitioned into tiles, each owned by a worker process.
+  """
+
+  def __init__(self, region, numShards):
+    """
+    Move the Region's input, proximal synapse and column grid arrays into
+    shared memory and start the worker processes.  The Region keeps using
+    the arrays as before, they are replaced by views of the shared memory.
+    @param region: the Region to shard (it must be in arrays mode).
+    @param numShards: the number of tiles (and worker processes), at most
+    the width of the column grid.
+    """
+    pool = region.proximalPool
+    if pool is None:
+      raise ValueError("sharded spatial pooling requires a Region in arrays mode")
+    self.region = region
+    w, h = region.width, region.height
+    self.numShards = max(1, min(numShards, w))
+
+    buffers = {}
+    buffers['input'] = _allocate('B', region.inputData)
+    buffers['inputIndex'] = _allocate('i', pool.inputIndex)
+    buffers['permanence'] = _allocate('d', pool.permanence)
+    buffers['distance'] = _allocate('d', pool.distance)
+    buffers['overlap'] = _allocate('d', region.overlapGrid)
+    buffers['active'] = _allocate('B', region.activeGrid.view(numpy.uint8))
+    buffers['boost'] = _allocate('d', region.boostGrid)
+    buffers['boosted'] = multiprocessing.RawArray('B', w*h)
+    buffers['params'] = multiprocessing.RawArray('d', NUM_PARAMS)
+    buffers['results'] = multiprocessing.RawArray('d', 3*self.numShards)
+    shapes = {'grid': (w, h), 'input': region.inputData.shape,
+              'pool': pool.permanence.shape}
+
+    self.inputData = _view(buffers['input'], numpy.uint8, shapes['input'])
+    self.boostedGrid = _view(buffers['boosted'], numpy.bool_, (w, h))
+    self.params = _view(buffers['params'], numpy.float64, (NUM_PARAMS,))
+    self.results = _view(buffers['results'], numpy.float64, (self.numShards, 3))
+    pool.inputIndex = _view(buffers['inputIndex'], numpy.int32, shapes['pool'])
+    pool.permanence = _view(buffers['permanence'], numpy.float64, shapes['pool'])
+    pool.distance = _view(buffers['distance'], numpy.float64, shapes['pool'])
+    region.overlapGrid = _view(buffers['overlap'], numpy.float64, (w, h))
+    region.activeGrid = _view(buffers['active'], numpy.bool_, (w, h))
+    region.boostGrid = _view(buffers['boost'], numpy.float64, (w, h))
+
+    #tile i is the grid rows bounds[i]:bounds[i+1]
+    bounds = numpy.linspace(0, w, self.numShards+1).round().astype(int)
+    self.bounds = bounds.tolist()
+    self.done = multiprocessing.Semaphore(0)
+    self.starts = []
+    self.workers = []
+    for i in xrange(self.numShards):
+      start = multiprocessing.Semaphore(0)
+      worker = multiprocessing.Process(target=_runShard, args=(i, self.bounds[i], \
+                                       self.bounds[i+1], buffers, shapes, start, self.done))
+      worker.daemon = True
+      worker.start()
+      self.starts.append(start)
+      self.workers.append(worker)
+
+  def computeActiveColumns(self):
+    """
+    Compute the overlaps of all Columns for the Region's current inputData
+    and the winning Columns after inhibition (spatial pooling Phases 1 and 2),
+    leaving them in the Region's overlapGrid and activeGrid.
+    """
+    region = self.region
+    self.inputData[...] = region.inputData
+    self.params[RADIUS] = int(round(region.inhibitionRadius))
+    self.params[LOCAL_ACTIVITY] = region.desiredLocalActivity
+    self.params[MIN_OVERLAP] = region.minOverlap
+    self.__runCommand(OVERLAP)
+    self.__runCommand(INHIBIT)
+
+  def updatePermanences(self, boostedCols, boostAmount):
+    """
+    Perform the permanence learning of all Columns for the active Columns of
+    the last computeActiveColumns (see ProximalPool.updatePermanences).
+    @param boostedCols: 2d boolean grid of the Columns to boost permanences for.
+    @param boostAmount: permanence increase for synapses of boosted Columns.
+    """
+    self.boostedGrid[...] = boostedCols
+    self.params[BOOST_AMOUNT] = boostAmount
+    self.__runCommand(LEARN)
+    changed = self.results[:,0]!=0
+    if changed.any():
+      self.region.proximalPool.connectionsChanged = True
+      self.region.updateReceptiveField(self.results[changed,1].sum(), \
+                                       int(self.results[changed,2].sum()))
+
+  def __runCommand(self, command):
+    """ Have every worker perform the command and wait for them all to finish. """
+    self.params[COMMAND] = command
+    self.params[CONNECTED_PERM] = Synapse.CONNECTED_PERM
+    self.params[PERMANENCE_INC] = Synapse.PERMANENCE_INC
+    self.params[PERMANENCE_DEC] = Synapse.PERMANENCE_DEC
+    for start in self.starts:
+      start.release()
+    for i in xrange(self.numShards):
+      while not self.done.acquire(True, WAIT_TIMEOUT):
+        if not all(worker.is_alive() for worker in self.workers):
+          raise RuntimeError("a spatial pooling worker process exited unexpectedly")
+
+  def close(self):
+    """
+    Stop the worker processes.  The Region keeps its (shared memory) arrays
+    and continues with single process spatial pooling.
+    """
+    self.params[COMMAND] = STOP
+    for start in self.starts:
+      start.release()
+    for worker in self.workers:
+      worker.join(WAIT_TIMEOUT)
+      if worker.is_alive():
+        worker.terminate()
+    self.workers = []
+    self.starts = []
@@ -11,6 +11,8 @@ class Synapse(object):
   roughly represents.
   """
   
+  __slots__ = ('inputSource', 'permanence')
+  
   #Static parameters that apply to all Region instances
   CONNECTED_PERM = 0.2  #Synapses with permanences above this value are connected.
   PERMANENCE_INC = 0.05 #Amount permanences of synapses are incremented in learning.
@@ -0,0 +1,329 @@
+"""
+Created on Oct 16, 2026
+
+Run a hierarchy of HTM Regions over a stream of input frames without any UI.
+
+The Camera Toolkit only drives its Regions from wx idle events, one frame at
+a time with rendering in between.  The RegionRunner here instead pulls frames
+from any iterator (see the frame sources below) and runs a stack of Regions
+as fast as possible, each Region receiving the sparse output of the one
+below it, and lazily yields the outputs and prediction accuracy of every
+Region for each frame along with the running frames per second.
+
+Frame sources yield 2d (x,y) uint8 arrays of 0/1 input bits (the directory
+and video sources reuse one array, so copy a frame to keep it):
+
+stackFrames: the frames of a numpy array stack already in input bit form.
+directoryFrames: the image files of a directory (PIL), in file name order.
+videoFrames: the frames of a video file (OpenCV), processed as the Camera
+  Toolkit does, using motion detection for frames that are not already of
+  the Region input size.
+
+The module can also be run as a script for overnight training and regression
+runs, for example:
+
+  python RegionRunner.py video/Rectangle17.avi --loops 100 --save r1.htm
+"""
+
+import os
+import sys
+import time
+import numpy
+from optparse import OptionParser
+from HTM.Region import Region
+from HTM import Checkpoint
+
+try:
+  import cv
+except ImportError: #only needed by videoFrames
+  cv = None
+try:
+  from PIL import Image
+except ImportError: #only needed by directoryFrames
+  Image = None
+
+INPUT_SHAPE = (80,60) #the Camera Toolkit's Region 1 input size
+MOTION_THRESHOLD = 16.0 #min gray level change for a pixel to count as motion
+IMAGE_EXTENSIONS = ('.bmp', '.jpg', '.png')
+
+def stackFrames(stack):
+  """
+  Yield the frames of a stack of input bit matrices.
+  @param stack: 3d numpy array (frames x width x height) of 0/1 input bits,
+  or a list of 2d input bit arrays.
+  """
+  for frame in stack:
+    yield frame
+
+def directoryFrames(directory, shape=INPUT_SHAPE):
+  """
+  Yield the image files (bmp, jpg or png) of a directory as input bit
+  matrices, in the alphabetical order of their file names.  The images are
+  converted to gray-scale and resized to the input shape, and white (255)
+  pixels become the 1 bits.
+  @param directory: the directory holding the image files.
+  @param shape: the (x,y) size of the yielded input bit matrices.
+  """
+  if Image is None:
+    raise RuntimeError("reading image directories requires PIL")
+  bits = numpy.zeros(shape, dtype=numpy.uint8)
+  for name in sorted(os.listdir(directory)):
+    if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+      continue
+    image = Image.open(os.path.join(directory, name)).convert('L')
+    if image.size!=shape:
+      image = image.resize(shape)
+    imgMat = numpy.asarray(image, dtype=numpy.uint8).reshape((shape[1],shape[0]))
+    numpy.floor_divide(imgMat.T, 255, bits) #255 for white needs to be 1s instead
+    yield bits
+
+def videoFrames(path, shape=INPUT_SHAPE, mirror=True):
+  """
+  Yield the frames of a video file as input bit matrices, as processed by
+  the Camera Toolkit.  Frames already of the input size are just converted
+  to gray-scale, others become a mask of the pixels that changed by more than
+  MOTION_THRESHOLD since the previous frame (resized to the input size).
+  White (255) pixels become the 1 bits.
+  @param path: the video file to read.
+  @param shape: the (x,y) size of the yielded input bit matrices.
+  @param mirror: mirror motion frames left to right as the Camera Toolkit does.
+  """
+  if cv is None:
+    raise RuntimeError("reading video files requires OpenCV")
+  capture = cv.CaptureFromFile(path)
+  bits = numpy.zeros(shape, dtype=numpy.uint8)
+  frameOut = cv.CreateImage(shape, cv.IPL_DEPTH_8U, 1)
+  grayImage = None
+  frame = cv.QueryFrame(capture)
+  while frame:
+    if (frame.width, frame.height)==shape:
+      cv.CvtColor(frame, frameOut, cv.CV_RGB2GRAY)
+    else:
+      if grayImage is None:
+        size = (frame.width, frame.height)
+        grayImage = cv.CreateImage(size, cv.IPL_DEPTH_8U, 1)
+        prevImage = cv.CreateImage(size, cv.IPL_DEPTH_8U, 1)
+        diffImage = cv.CreateImage(size, cv.IPL_DEPTH_8U, 1)
+        cv.CvtColor(frame, prevImage, cv.CV_RGB2GRAY)
+      cv.CvtColor(frame, grayImage, cv.CV_RGB2GRAY)
+      cv.AbsDiff(grayImage, prevImage, diffImage)
+      cv.Copy(grayImage, prevImage) #save as t-1 image for next frame
+      cv.Threshold(diffImage, diffImage, MOTION_THRESHOLD, 255.0, cv.CV_THRESH_BINARY)
+      cv.Resize(diffImage, frameOut, cv.CV_INTER_NN)
+      if mirror:
+        cv.Flip(frameOut, frameOut, 1)
+    imgMat = numpy.fromstring(frameOut.tostring(), dtype=numpy.uint8)
+    imgMat = imgMat.reshape((shape[1],shape[0]))
+    numpy.floor_divide(imgMat.T, 255, bits) #255 for white needs to be 1s instead
+    yield bits
+    frame = cv.QueryFrame(capture)
+
+def getSequencePredictedColumns(region):
+  """
+  Return a 2d boolean column grid marking the columns of the region with a
+  cell predicting due to an active sequence segment, meaning the column is
+  predicted to become active in the next time step.
+  @param region: a Region or FrozenRegion that has just been run.
+  """
+  shape = region.activeGrid.shape
+  if hasattr(region, 'cellSequencePredicting'): #FrozenRegion
+    return region.cellSequencePredicting.any(axis=1).reshape(shape)
+  predicted = numpy.zeros(shape, dtype=numpy.bool_)
+  for ci, i in zip(*numpy.nonzero(region.cellPredicting)):
+    cell = region.columns[ci].cells[i]
+    for seg in cell.segments:
+      if seg.isActive() and seg.isSequence:
+        predicted.ravel()[ci] = True
+        break
+  return predicted
+
+
+class RunnerStep(object):
+  """
+  The results of running all Regions of a RegionRunner for one input frame.
+  The accuracy lists hold one value (0.0-1.0) per Region:
+  predictionAccuracy: correctly predicted active columns out of all the
+    columns predicted (by sequence segments) at the previous frame.
+  activationAccuracy: correctly predicted active columns out of all the
+    active columns.
+  The mean accuracies are running averages since the runner started.
+  """
+
+  __slots__ = ('frame', 'outputs', 'predictionAccuracy', 'activationAccuracy',
+               'meanPredictionAccuracy', 'meanActivationAccuracy', 'fps')
+
+  def __init__(self, frame, outputs, predictionAccuracy, activationAccuracy,
+               meanPredictionAccuracy, meanActivationAccuracy, fps):
+    self.frame = frame #number of the frame (counting from 0)
+    self.outputs = outputs #sparse output (see Region.getSparseOutput) per Region
+    self.predictionAccuracy = predictionAccuracy
+    self.activationAccuracy = activationAccuracy
+    self.meanPredictionAccuracy = meanPredictionAccuracy
+    self.meanActivationAccuracy = meanActivationAccuracy
+    self.fps = fps #frames per second processed since the runner started
+
+
+class RegionRunner(object):
+  """
+  Run a hierarchy of Regions over an iterator of input frames.
+  """
+
+  def __init__(self, regions, measureAccuracy=True):
+    """
+    @param regions: list of Regions (or FrozenRegions) from the bottom of the
+    hierarchy up, each taking the output of the previous one as its input.
+    Their learning states are used as set by the caller.
+    @param measureAccuracy: if False skip computing the prediction accuracies
+    (they are reported as 0) for the highest possible throughput.
+    """
+    self.regions = regions
+    self.measureAccuracy = measureAccuracy
+    self.frameCount = 0
+    self.elapsed = 0.0
+    self.predictedCols = [None] * len(regions)
+    self.sumAccPred = [0.0] * len(regions)
+    self.sumAccActive = [0.0] * len(regions)
+
+  def getFPS(self):
+    """ Return the number of frames per second processed so far. """
+    if self.elapsed > 0:
+      return self.frameCount / self.elapsed
+    return 0.0
+
+  def run(self, frames, maxFrames=None):
+    """
+    Run the Regions for each frame of the iterator and lazily yield a
+    RunnerStep with the results of every frame.  Only the time spent running
+    the Regions (and measuring their accuracy) counts towards the fps.
+    @param frames: iterator of 2d (x,y) input bit matrices for Region 1.
+    @param maxFrames: stop after this many frames (None to run all frames).
+    """
+    count = 0
+    for frame in frames:
+      if maxFrames is not None and count >= maxFrames:
+        break
+      count += 1
+      yield self.runOnce(frame)
+
+  def runOnce(self, frame):
+    """
+    Run the Regions for one input frame.
+    @param frame: 2d (x,y) input bit matrix for Region 1.
+    @return a RunnerStep with the results.
+    """
+    startTime = time.time()
+    numRegions = len(self.regions)
+    outputs = []
+    accPred = [0.0] * numRegions
+    accActive = [0.0] * numRegions
+    rInput = frame
+    for i, region in enumerate(self.regions):
+      region.updateInput(rInput)
+      region.runOnce()
+      rInput = region.getSparseOutput()
+      outputs.append(rInput)
+      if self.measureAccuracy:
+        accPred[i], accActive[i] = self.__measureAccuracy(i, region)
+    self.elapsed += time.time() - startTime
+    self.frameCount += 1
+
+    n = self.frameCount
+    return RunnerStep(n-1, outputs, accPred, accActive, \
+                      [s / n for s in self.sumAccPred], \
+                      [s / n for s in self.sumAccActive], self.getFPS())
+
+  def __measureAccuracy(self, i, region):
+    """
+    Compare the region's active columns to those it predicted at the previous
+    frame, and update the running sums.
+    @return a tuple of the prediction and activation accuracies.
+    """
+    a = region.activeGrid
+    p = self.predictedCols[i]
+    pctP = 0.0
+    pctA = 0.0
+    if p is not None:
+      hits = numpy.count_nonzero(a & p)
+      if p.any():
+        pctP = (1.0*hits) / numpy.count_nonzero(p)
+      if a.any():
+        pctA = (1.0*hits) / numpy.count_nonzero(a)
+    self.sumAccPred[i] += pctP
+    self.sumAccActive[i] += pctA
+    #save the current prediction to compare to next frame
+    self.predictedCols[i] = getSequencePredictedColumns(region)
+    return pctP, pctA
+
+
+def openFrames(source):
+  """
+  Return the frame iterator for the source: a directory of images, a numpy
+  (.npy) stack of input bit matrices, or a video file.
+  """
+  if os.path.isdir(source):
+    return directoryFrames(source)
+  if source.endswith('.npy'):
+    return stackFrames(numpy.load(source, mmap_mode='r'))
+  return videoFrames(source)
+
+def main(argv):
+  """ Run Regions over frames from the command line (see --help). """
+  parser = OptionParser(usage="%prog [options] source\n\n"+
+                        "source is a video file, image directory or .npy input stack")
+  parser.add_option("--load", action="append", default=[], metavar="FILE",
+                    help="Region checkpoint to run (repeat for each level, bottom first)")
+  parser.add_option("--frozen", action="store_true", default=False,
+                    help="run the loaded checkpoints inference-only (see FrozenRegion)")
+  parser.add_option("--save", action="append", default=[], metavar="FILE",
+                    help="save the Region of each level to a checkpoint when done")
+  parser.add_option("--loops", type="int", default=1,
+                    help="number of times to run through the source")
+  parser.add_option("--frames", type="int", default=None,
+                    help="stop after this many frames per loop")
+  parser.add_option("--no-learning", action="store_true", default=False,
+                    help="run with spatial and temporal learning off")
+  parser.add_option("--report", type="int", default=100, metavar="N",
+                    help="print accuracy and fps every N frames")
+  parser.add_option("--shards", type="int", default=0, metavar="N",
+                    help="shard the spatial pooling of each Region across N processes")
+  options, args = parser.parse_args(argv)
+  if len(args)!=1:
+    parser.error("a single frame source is required")
+
+  if options.frozen:
+    if not options.load:
+      parser.error("--frozen requires Region checkpoints to --load")
+    regions = [Checkpoint.loadFrozenRegion(path) for path in options.load]
+    options.save = []
+    options.no_learning = True
+  elif options.load:
+    regions = [Checkpoint.loadRegion(path) for path in options.load]
+  else: #use the Camera Toolkit's default Region 1 parameters
+    regions = [Region(INPUT_SHAPE, (40,30), pctInputPerCol=0.15, localityRadius=5,
+                      pctLocalActivity=0.1, useArrays=True, fastInit=True)]
+  for region in regions:
+    region.spatialLearning = not options.no_learning
+    region.temporalLearning = not options.no_learning
+    if options.shards > 1 and not options.frozen and region.useArrays:
+      region.startSharding(options.shards)
+
+  runner = RegionRunner(regions)
+  step = None
+  for loop in xrange(options.loops):
+    for step in runner.run(openFrames(args[0]), options.frames):
+      if options.report > 0 and (step.frame+1) % options.report==0:
+        acc = " ".join(["%.1f%%/%.1f%%" % (100.0*p, 100.0*a) for p, a in \
+                        zip(step.meanPredictionAccuracy, step.meanActivationAccuracy)])
+        print "frame %d  %.1f fps  mean accuracy (predicted/active) %s" % \
+              (step.frame+1, step.fps, acc)
+  if step:
+    print "%d frames at %.1f fps" % (step.frame+1, step.fps)
+
+  for region, path in zip(regions, options.save):
+    Checkpoint.saveRegion(region, path)
+  for region in regions:
+    if not options.frozen:
+      region.stopSharding()
+
+if __name__ == '__main__':
+  main(sys.argv[1:])